@@ -2,8 +2,23 @@
 
 __version__ = "0.1.0"
 
-from repomix.utils.models import LLMResponse, TokenUsage, MultiDirectoryResponse
-from repomix.utils.llm import query_model, initialize_litellm_cache, save_response
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from repomix.utils.models import LLMResponse, TokenUsage, MultiDirectoryResponse
+    from repomix.utils.llm import query_model, initialize_litellm_cache, save_response
+
+# Public attributes are imported on first access (PEP 562) so that importing
+# repomix, e.g. for `repomix --help`, does not pull in litellm.
+_LAZY_ATTRS = {
+    "LLMResponse": "repomix.utils.models",
+    "TokenUsage": "repomix.utils.models",
+    "MultiDirectoryResponse": "repomix.utils.models",
+    "query_model": "repomix.utils.llm",
+    "initialize_litellm_cache": "repomix.utils.llm",
+    "save_response": "repomix.utils.llm",
+}
 
 __all__ = [
     "LLMResponse",
@@ -12,4 +27,10 @@ __all__ = [
     "query_model",
     "initialize_litellm_cache",
     "save_response",
-] 
\ No newline at end of file
+]
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
@@ -25,10 +25,8 @@ warnings.filterwarnings(
     module="pydantic.*"
 )
 
-from repomix.utils.git import parse_github_url, clone_repository, cleanup_repository, is_github_url, parse_multi_urls, clone_github_repo
-from repomix.utils.analyzer import analyze_directory, analyze_directories_combined, analyze_single_directory, analyze_multiple_directories_combined
-from repomix.utils.llm import query_model, LLMResponse
-from repomix.utils.spacy_utils import count_tokens
+from repomix.utils.git import parse_github_url, clone_repository, clone_repository_async, cleanup_repository, is_github_url, parse_multi_urls, clone_github_repo
+from repomix.utils.models import LLMResponse
 
 # Configure loguru with structured logging and context
 logger.remove()  # Remove default handler
@@ -48,7 +46,7 @@ logger.add(
     diagnose=True   # Additional diagnostic info
 )
 
-DEFAULT_IGNORE_PATTERNS: List[str] = [
+DEFAULT_IGNORE_PATTERNS: Tuple[str, ...] = (
     # Version control
     ".git/*",
     ".gitignore",
@@ -149,7 +147,7 @@ DEFAULT_IGNORE_PATTERNS: List[str] = [
     # Other
     ".DS_Store",
     "Thumbs.db"
-]
+)
 
 class MultiDirectoryResponse(BaseModel):
     """Container for multiple directory analysis results."""
@@ -170,11 +168,14 @@ def async_command(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         try:
-            loop = asyncio.get_event_loop()
+            asyncio.get_running_loop()
         except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        return loop.run_until_complete(f(*args, **kwargs))
+            # No loop running: run on a fresh loop that is closed afterwards
+            return asyncio.run(f(*args, **kwargs))
+        raise RuntimeError(
+            f"Command '{f.__name__}' cannot be invoked from a running event loop; "
+            "call it from synchronous code"
+        )
     return wrapper
 
 @cli.command()
@@ -185,6 +186,23 @@ def async_command(f):
 @async_command
 async def ask(repo_dir: str, question: str, model: str, stream: bool):
     """Ask a question about a repository or directory."""
+    await ask_core(repo_dir, question, model, stream)
+
+async def ask_core(repo_dir: str, question: str, model: str, stream: bool = False) -> int:
+    """Answer a question about a repository or directory, echoing the response.
+    
+    This is the body of the ``ask`` command without Click's argument parsing,
+    so it can be called directly.
+    
+    Returns:
+        int: Exit code, 0 on success
+    
+    Raises:
+        click.ClickException: If the directory is missing or the query fails
+    """
+    # Deferred so `repomix --help` does not import litellm
+    from repomix.utils.llm import query_model, create_http_client
+
     click.echo(f"Starting analysis of repository: {repo_dir}", err=True)
     click.echo(f"Question: {question}", err=True)
     click.echo(f"Using model: {model}", err=True)
@@ -202,35 +220,38 @@ async def ask(repo_dir: str, question: str, model: str, stream: bool):
             repo_path = await clone_github_repo(repo_dir)
             click.echo(f"Repository cloned to: {repo_path}", err=True)
 
-        # Process directory
-        response = await query_model(
-            model=model,
-            content=f"Analyze this repository and answer: {question}\n\nRepository: {repo_path}",
-            system_prompt="You are a helpful assistant analyzing code repositories.",
-            stream=stream
-        )
+        async with create_http_client() as session:
+            # Process directory
+            response = await query_model(
+                model=model,
+                content=f"Analyze this repository and answer: {question}\n\nRepository: {repo_path}",
+                system_prompt="You are a helpful assistant analyzing code repositories.",
+                stream=stream,
+                session=session
+            )
 
-        if stream and hasattr(response, "__aiter__"):
-            # Handle streaming response
-            async for chunk in response:
-                if isinstance(chunk, str):
-                    click.echo(chunk, nl=False)
-                else:
-                    click.echo(chunk.choices[0].delta.content or "", nl=False)
-            click.echo()  # Final newline
-        else:
-            # Handle non-streaming response
-            if isinstance(response, str):
-                click.echo(response)
-            elif isinstance(response, LLMResponse):  # Type check for LLMResponse
-                click.echo(response.response)
-                if hasattr(response, "usage"):  # Check if usage exists
-                    click.echo(f"Response tokens: {response.usage.total_tokens}", err=True)
-                    click.echo(f"\nTokens used: {response.usage.total_tokens}")
+            if stream and hasattr(response, "__aiter__"):
+                # Handle streaming response
+                async for chunk in response:
+                    if isinstance(chunk, str):
+                        click.echo(chunk, nl=False)
+                    else:
+                        click.echo(chunk.choices[0].delta.content or "", nl=False)
+                click.echo()  # Final newline
+            else:
+                # Handle non-streaming response
+                if isinstance(response, str):
+                    click.echo(response)
+                elif isinstance(response, LLMResponse):  # Type check for LLMResponse
+                    click.echo(response.response)
+                    if hasattr(response, "usage"):  # Check if usage exists
+                        click.echo(f"Response tokens: {response.usage.total_tokens}", err=True)
+                        click.echo(f"\nTokens used: {response.usage.total_tokens}")
 
     except Exception as e:
         logger.error("Fatal error during processing", exc_info=True)
         raise click.ClickException(str(e))
+    return 0
 
 @cli.command()
 @click.argument('urls', nargs=-1, required=True)
@@ -249,6 +270,10 @@ async def analyze(urls: Tuple[str, ...], model: str, output_dir: str,
     URLS can be GitHub repository URLs or local directory paths, prefixed with @.
     Example: repomix analyze @path/to/repo1 @path/to/repo2 --model gpt-4
     """
+    # Deferred so `repomix --help` does not import litellm
+    from repomix.utils.analyzer import analyze_directories_concurrently, analyze_directories_combined
+    from repomix.utils.llm import create_http_client
+
     try:
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
@@ -268,79 +293,96 @@ async def analyze(urls: Tuple[str, ...], model: str, output_dir: str,
 
         # Check if any URL is a GitHub URL
         has_github_url = any(url.startswith('https://github.com/') for url in urls)
+        repo_dir = None
 
-        if has_github_url:
-            # Clone repository
-            repo_dir = await clone_github_repo(multi_info.repo_url)
-            try:
+        # One pooled HTTP client for every LLM request in this run
+        async with create_http_client() as session:
+            if has_github_url:
+                # Clone the requested branch, fetching only the target directories
+                repo_dir = await clone_repository_async(
+                    multi_info.repo_url, multi_info.branch, multi_info.target_dirs
+                )
+                try:
+                    if combined_analysis:
+                        click.echo("Using combined analysis", err=True)
+                        tokens = await analyze_directories_combined(
+                            [Path(repo_dir) / d for d in multi_info.target_dirs],
+                            output_dir,
+                            model,
+                            ignore_list,
+                            system_prompt,
+                            max_tokens,
+                            session
+                        )
+                        total_tokens += tokens
+                    else:
+                        existing_dirs = []
+                        for target_dir in multi_info.target_dirs:
+                            dir_path = Path(repo_dir) / target_dir
+                            if not dir_path.exists():
+                                click.echo(f"Directory not found: {dir_path}", err=True)
+                                continue
+                            existing_dirs.append(dir_path)
+                        total_tokens += await analyze_directories_concurrently(
+                            existing_dirs,
+                            output_dir,
+                            model,
+                            ignore_list,
+                            system_prompt,
+                            max_tokens,
+                            session
+                        )
+                except BaseException:
+                    # Remove the clone in a worker thread without blocking the loop
+                    await asyncio.get_running_loop().run_in_executor(None, cleanup_repository, repo_dir)
+                    raise
+            else:
+                # Process local directories
+                dirs_to_analyze = [Path(url.lstrip('@')) for url in urls]
+            
                 if combined_analysis:
+                    # Verify all directories exist
                     click.echo("Using combined analysis", err=True)
+                    existing_dirs = [d for d in dirs_to_analyze if d.exists()]
+                    if not existing_dirs:
+                        raise click.ClickException("No valid directories found")
+                
                     tokens = await analyze_directories_combined(
-                        [Path(repo_dir) / d for d in multi_info.target_dirs],
+                        existing_dirs,
                         output_dir,
                         model,
                         ignore_list,
                         system_prompt,
-                        max_tokens
+                        max_tokens,
+                        session
                     )
                     total_tokens += tokens
                 else:
-                    for target_dir in multi_info.target_dirs:
-                        dir_path = Path(repo_dir) / target_dir
+                    existing_dirs = []
+                    for dir_path in dirs_to_analyze:
                         if not dir_path.exists():
                             click.echo(f"Directory not found: {dir_path}", err=True)
                             continue
-                        tokens = await analyze_directory(
-                            dir_path,
-                            output_dir,
-                            model,
-                            ignore_list,
-                            system_prompt,
-                            max_tokens
-                        )
-                        total_tokens += tokens
-            finally:
-                # Clean up cloned repository
-                cleanup_repository(Path(repo_dir))  # Convert to Path
-        else:
-            # Process local directories
-            dirs_to_analyze = [Path(url.lstrip('@')) for url in urls]
-            
-            if combined_analysis:
-                # Verify all directories exist
-                click.echo("Using combined analysis", err=True)
-                existing_dirs = [d for d in dirs_to_analyze if d.exists()]
-                if not existing_dirs:
-                    raise click.ClickException("No valid directories found")
-                
-                tokens = await analyze_directories_combined(
-                    existing_dirs,
-                    output_dir,
-                    model,
-                    ignore_list,
-                    system_prompt,
-                    max_tokens
-                )
-                total_tokens += tokens
-            else:
-                for dir_path in dirs_to_analyze:
-                    if not dir_path.exists():
-                        click.echo(f"Directory not found: {dir_path}", err=True)
-                        continue
-                    tokens = await analyze_directory(
-                        dir_path,
+                        existing_dirs.append(dir_path)
+                    total_tokens += await analyze_directories_concurrently(
+                        existing_dirs,
                         output_dir,
                         model,
                         ignore_list,
                         system_prompt,
-                        max_tokens
+                        max_tokens,
+                        session
                     )
-                    total_tokens += tokens
 
         execution_time = time.time() - start_time
-        click.echo(f"\nAnalysis completed in {execution_time:.2f} seconds")
-        click.echo(f"Total tokens processed: {total_tokens}")
-        click.echo(f"Results saved in: {output_dir}")
+        try:
+            click.echo(f"\nAnalysis completed in {execution_time:.2f} seconds")
+            click.echo(f"Total tokens processed: {total_tokens}")
+            click.echo(f"Results saved in: {output_dir}")
+        finally:
+            # Print the summary before removing a large clone, not after
+            if repo_dir is not None:
+                await asyncio.get_running_loop().run_in_executor(None, cleanup_repository, repo_dir)
 
     except Exception as e:
         logger.error(f"Error analyzing directories: {str(e)}")
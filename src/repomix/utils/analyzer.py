@@ -1,25 +1,149 @@
 """Repository analysis utilities."""
 from typing import Dict, List, Optional, Tuple, Any, Union, AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import asyncio
+import hashlib
+import io
+import json
 import os
-import uuid
+import httpx
 from loguru import logger
 from repomix.utils.parser import glob_files, concatenate_files, chunk_content
-from repomix.utils.spacy_utils import count_tokens, truncate_text_by_tokens
-from repomix.utils.llm import query_model, LLMResponse, TokenUsage
+from repomix.utils.token_utils import count_tokens, truncate_text_by_tokens
+from repomix.utils.llm import (
+    query_model,
+    LLMResponse,
+    response_cache_key,
+    load_cached_response,
+    store_cached_response,
+)
 from repomix.utils.file_utils import collect_files, save_json, read_file
+from repomix.utils.multi_directory import cancel_and_wait
 
-def get_file_content(files: List[Path]) -> str:
-    """Get concatenated content from a list of files."""
-    content_parts = []
-    for file_path in files:
-        try:
-            content = read_file(file_path)
-            content_parts.append(f"File: {file_path}\n{content}\n")
-        except Exception as e:
-            logger.warning(f"Error reading file {file_path}: {e}")
+# Upper bound on threads used to read a directory's files
+MAX_READ_WORKERS = 32
+
+# Most directories packed into one request when analyzing them individually
+MAX_BATCH_DIRECTORIES = 4
+
+BATCH_INSTRUCTIONS = (
+    "The content contains {count} separate directories, each under a '## DIRECTORY <n>' "
+    "heading. Analyze each directory independently and reply with only a JSON array of "
+    "{count} strings, where element n-1 is the analysis of DIRECTORY n."
+)
+
+def get_concurrency_limit() -> int:
+    """Get the maximum number of in-flight LLM requests (REPOMIX_CONCURRENCY, default 8)."""
+    return max(1, int(os.getenv("REPOMIX_CONCURRENCY", "8")))
+
+def _read_file_or_none(file_path: Path) -> Optional[str]:
+    """Read a file, logging and returning None on failure."""
+    try:
+        return read_file(file_path)
+    except Exception as e:
+        logger.warning(f"Error reading file {file_path}: {e}")
+        return None
+
+def get_file_content(files: List[Path], seen: Optional[Dict[bytes, str]] = None) -> str:
+    """Get concatenated content from a list of files, reading them in parallel.
+
+    If ``seen`` is given it maps content digests to the first path emitted with
+    that content; later copies are emitted as a one-line reference instead.
+    """
+    if not files:
+        return ""
+    with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(files))) as executor:
+        contents = list(executor.map(_read_file_or_none, files))
+    buffer = io.StringIO()
+    for file_path, content in zip(files, contents):
+        if content is None:
             continue
-    return "\n".join(content_parts)
+        if buffer.tell():
+            buffer.write("\n")
+        if seen is not None:
+            digest = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+            original = seen.setdefault(digest, str(file_path))
+            if original != str(file_path):
+                buffer.write(f"File: {file_path} -> duplicate of {original}\n")
+                continue
+        buffer.write(f"File: {file_path}\n")
+        buffer.write(content)
+        buffer.write("\n")
+    return buffer.getvalue()
+
+def _pack_batches(dir_tokens: Dict[str, int], max_batch_tokens: int) -> List[List[str]]:
+    """Group directories in order into batches bounded by count and token budget."""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for directory, tokens in dir_tokens.items():
+        if current and (len(current) >= MAX_BATCH_DIRECTORIES or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(directory)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _split_batch_response(text: str, count: int) -> Optional[List[str]]:
+    """Extract the JSON array of per-directory analyses, or None if it is malformed."""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        return None
+    try:
+        parts = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(parts, list) or len(parts) != count or not all(isinstance(p, str) for p in parts):
+        return None
+    return parts
+
+async def _batch_query(
+    model_id: str,
+    prompts: List[str],
+    system_prompt: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    session: Optional[httpx.AsyncClient] = None
+) -> List[Optional[Tuple[str, int]]]:
+    """Answer several prompts with one request, falling back to one request each.
+
+    Returns an (analysis, tokens) pair per prompt, or None where no analysis was
+    produced. A batch's token usage is split evenly across its prompts.
+    """
+    if len(prompts) > 1:
+        packed = "\n\n".join(f"## DIRECTORY {i}\n{prompt}" for i, prompt in enumerate(prompts, 1))
+        instructions = BATCH_INSTRUCTIONS.format(count=len(prompts))
+        response = await query_model(
+            model=model_id,
+            content=packed,
+            system_prompt=f"{system_prompt}\n\n{instructions}" if system_prompt else instructions,
+            max_tokens=max_tokens,
+            session=session
+        )
+        if isinstance(response, LLMResponse):
+            parts = _split_batch_response(response.response, len(prompts))
+            if parts is not None:
+                tokens = response.usage.total_tokens // len(prompts)
+                return [(part, tokens) for part in parts]
+        logger.warning(f"Could not split batched response for {len(prompts)} directories; querying individually")
+
+    results: List[Optional[Tuple[str, int]]] = []
+    for prompt in prompts:
+        response = await query_model(
+            model=model_id,
+            content=prompt,
+            system_prompt=system_prompt,
+            max_tokens=max_tokens,
+            session=session
+        )
+        # Handle streaming responses
+        if isinstance(response, AsyncGenerator):
+            results.append(None)
+        else:
+            results.append((response.response, response.usage.total_tokens))
+    return results
 
 async def analyze_single_directory(
     repo_dir: Path,
@@ -27,7 +151,8 @@ async def analyze_single_directory(
     model_id: str,
     ignore_patterns: List[str],
     system_prompt: Optional[str],
-    max_tokens: int
+    max_tokens: int,
+    session: Optional[httpx.AsyncClient] = None
 ) -> Tuple[str, Optional[LLMResponse], Optional[str]]:
     """Analyze a single directory and return its content and response."""
     try:
@@ -36,22 +161,31 @@ async def analyze_single_directory(
             return target_dir, None, "No files found matching criteria"
             
         content = concatenate_files(files, repo_dir, str(repo_dir), target_dir)
-        total_tokens = count_tokens(content)
+        total_tokens = count_tokens(content, model_id)
         
         if total_tokens > max_tokens:
-            content = truncate_text_by_tokens(content, max_tokens)
+            content = truncate_text_by_tokens(content, max_tokens, model_id)
             logger.warning(f"{target_dir}: Truncated content from {total_tokens} to {max_tokens} tokens")
             
+        # Reuse the previous answer if this exact request was made before
+        cache_key = response_cache_key(model_id, content, system_prompt, max_tokens)
+        cached = await asyncio.get_running_loop().run_in_executor(None, load_cached_response, cache_key)
+        if cached is not None:
+            logger.info(f"{target_dir}: Using cached response")
+            return target_dir, cached, None
+
         response = await query_model(
             model=model_id,
             content=content,
             system_prompt=system_prompt,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            session=session
         )
         # Cast the response to handle both LLMResponse and AsyncGenerator
         if isinstance(response, AsyncGenerator):
             logger.warning("Streaming responses not yet supported for directory analysis")
             return target_dir, None, "Streaming responses not supported"
+        await asyncio.get_running_loop().run_in_executor(None, store_cached_response, cache_key, response)
         return target_dir, response, None
         
     except Exception as e:
@@ -64,19 +198,31 @@ async def analyze_multiple_directories_combined(
     ignore_patterns: Optional[List[str]] = None,
     system_prompt: Optional[str] = None,
     max_tokens: Optional[int] = None,
+    session: Optional[httpx.AsyncClient] = None,
+    output_dir: str = ".",
 ) -> Dict[str, Any]:
-    """Analyze multiple directories together."""
-    results: List[Dict[str, Any]] = []
-    total_tokens = 0
+    """Analyze multiple directories together.
 
-    # Log token count for each directory
+    When the content is too large for one request, each directory is analyzed
+    separately and written to ``{output_dir}/{directory}_analysis.json``, with
+    ``manifest.jsonl`` in ``output_dir`` indexing the shards.
+    """
+    # Read and tokenize each directory once; each shard is analyzed on its own,
+    # so its content stays complete
+    dir_files: Dict[str, List[Path]] = {}
+    dir_contents: Dict[str, str] = {}
+    dir_tokens: Dict[str, int] = {}
+    total_tokens = 0
     for directory in directories:
         full_dir_path = os.path.join(repo_dir, directory)
         files = collect_files(full_dir_path, ignore_patterns or [])
         if not files:
             continue
         content = get_file_content(files)
-        token_count = count_tokens(content)
+        token_count = count_tokens(content, model_id)
+        dir_files[directory] = files
+        dir_contents[directory] = content
+        dir_tokens[directory] = token_count
         total_tokens += token_count
         logger.info(f"Directory {directory}: {token_count} tokens")
 
@@ -84,67 +230,66 @@ async def analyze_multiple_directories_combined(
     max_context_size = 6000
     if total_tokens > max_context_size:
         logger.warning(f"Total content ({total_tokens} tokens) exceeds maximum context size ({max_context_size})")
-        logger.info("Analyzing directories individually")
-        
-        combined_results: List[Dict[str, Any]] = []
-        for directory in directories:
-            full_dir_path = os.path.join(repo_dir, directory)
-            files = collect_files(full_dir_path, ignore_patterns or [])
-            if not files:
-                continue
-            
-            content = get_file_content(files)
-            response = await query_model(
-                model=model_id,
-                content=content,
-                system_prompt=system_prompt,
-                max_tokens=max_tokens
-            )
-            
-            # Handle streaming responses
-            if isinstance(response, AsyncGenerator):
-                logger.warning(f"Streaming response not supported for directory {directory}")
-                continue
-                
-            combined_results.append({
-                "directory": directory,
-                "analysis": response.response,
-                "tokens": response.usage.total_tokens
-            })
-        
-        # Create a combined response
-        combined_response = LLMResponse(
-            id=str(uuid.uuid4()),
-            response="\n\n".join([
-                f"Analysis for {result['directory']}:\n{result['analysis']}"
-                for result in combined_results
-            ]),
-            metadata={
-                "model": model_id,
-                "analysis_type": "combined",
-                "directories": directories,
-                "total_tokens": total_tokens,
-            },
-            usage=TokenUsage(
-                prompt_tokens=sum(int(result['tokens']) for result in combined_results),
-                completion_tokens=0,
-                total_tokens=sum(int(result['tokens']) for result in combined_results)
-            )
-        )
+        logger.info("Analyzing directories individually, in batches")
         
+        sem = asyncio.Semaphore(get_concurrency_limit())
+
+        async def _analyze_batch(batch: List[str]) -> List[Dict[str, Any]]:
+            async with sem:
+                answers = await _batch_query(
+                    model_id,
+                    [dir_contents[d] for d in batch],
+                    system_prompt,
+                    max_tokens,
+                    session
+                )
+            results = []
+            for directory, answer in zip(batch, answers):
+                if answer is None:
+                    logger.warning(f"Streaming response not supported for directory {directory}")
+                    continue
+                analysis, tokens = answer
+                results.append({"directory": directory, "analysis": analysis, "tokens": tokens})
+            return results
+
+        # Pack small directories together so they share one request and system prompt
+        batches = _pack_batches(dir_tokens, max_context_size)
+
+        # Write each analysis to its own shard as it completes and index it in
+        # manifest.jsonl, so only one response is held in memory at a time
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, "manifest.jsonl")
+        tasks = [asyncio.ensure_future(_analyze_batch(batch)) for batch in batches]
+        with open(manifest_path, 'w', encoding='utf-8') as manifest:
+            try:
+                for task in asyncio.as_completed(tasks):
+                    for result in await task:
+                        shard_name = f"{result['directory'].replace(os.sep, '_')}_analysis.json"
+                        await asyncio.get_running_loop().run_in_executor(None, save_json, os.path.join(output_dir, shard_name), result)
+                        manifest.write(json.dumps({
+                            "directory": result["directory"],
+                            "response_file": shard_name,
+                            "tokens": result["tokens"],
+                        }) + "\n")
+                    manifest.flush()
+            except BaseException:
+                # Don't leave the other batches' requests running after a failure
+                await cancel_and_wait(tasks)
+                raise
+
         return {
-            "combined": combined_response,
+            "combined": None,
+            "response_file": manifest_path,
             "total_tokens": total_tokens
         }
     
-    # If total tokens are within limit, analyze all directories together
-    all_content = []
-    for directory in directories:
-        full_dir_path = os.path.join(repo_dir, directory)
-        files = collect_files(full_dir_path, ignore_patterns or [])
-        if files:
-            content = get_file_content(files)
-            all_content.append(f"Content for {directory}:\n{content}")
+    # If total tokens are within limit, analyze all directories together. They
+    # share one request, so files repeated across directories are sent once
+    seen: Dict[bytes, str] = {}  # content digest -> first path
+    all_content = [
+        f"Content for {directory}:\n{get_file_content(files, seen)}"
+        for directory, files in dir_files.items()
+    ]
     
     combined_content = "\n\n".join(all_content)
     try:
@@ -152,7 +297,8 @@ async def analyze_multiple_directories_combined(
             model=model_id,
             content=combined_content,
             system_prompt=system_prompt,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            session=session
         )
         
         # Handle streaming responses
@@ -177,7 +323,8 @@ async def analyze_directory(
     model_id: str,
     ignore_patterns: Optional[List[str]] = None,
     system_prompt: Optional[str] = None,
-    max_tokens: Optional[int] = None
+    max_tokens: Optional[int] = None,
+    session: Optional[httpx.AsyncClient] = None
 ) -> int:
     """Analyze a single directory and save results.
     
@@ -188,6 +335,7 @@ async def analyze_directory(
         ignore_patterns: Patterns to ignore
         system_prompt: System prompt for model
         max_tokens: Maximum tokens for response
+        session: Optional shared HTTP client for LLM requests
         
     Returns:
         Number of tokens processed
@@ -198,7 +346,8 @@ async def analyze_directory(
         model_id,
         ignore_patterns or [],
         system_prompt,
-        max_tokens or 4000
+        max_tokens or 4000,
+        session
     )
     
     if error:
@@ -207,7 +356,7 @@ async def analyze_directory(
         
     if response:
         output_file = os.path.join(output_dir, f"{dir_path.name}_analysis.json")
-        save_json(output_file, response.model_dump())
+        await asyncio.get_running_loop().run_in_executor(None, save_json, output_file, response.model_dump())
         return response.usage.total_tokens
         
     return 0
@@ -218,7 +367,8 @@ async def analyze_directories_combined(
     model_id: str,
     ignore_patterns: Optional[List[str]] = None,
     system_prompt: Optional[str] = None,
-    max_tokens: Optional[int] = None
+    max_tokens: Optional[int] = None,
+    session: Optional[httpx.AsyncClient] = None
 ) -> int:
     """Analyze multiple directories together and save results.
     
@@ -229,13 +379,16 @@ async def analyze_directories_combined(
         ignore_patterns: Patterns to ignore
         system_prompt: System prompt for model
         max_tokens: Maximum tokens for response
+        session: Optional shared HTTP client for LLM requests
         
     Returns:
         Number of tokens processed
     """
-    # Find common parent
-    common_parent = os.path.commonpath([str(d) for d in dirs])
-    relative_dirs = [str(d.relative_to(common_parent)) for d in dirs]
+    # Find common parent once and slice it off each path
+    dir_strs = [os.fspath(d) for d in dirs]
+    common_parent = os.path.commonpath(dir_strs)
+    prefix_len = len(common_parent) if common_parent.endswith(os.sep) else len(common_parent) + 1
+    relative_dirs = [d[prefix_len:] or "." for d in dir_strs]
     
     result = await analyze_multiple_directories_combined(
         common_parent,
@@ -243,11 +396,60 @@ async def analyze_directories_combined(
         model_id,
         ignore_patterns,
         system_prompt,
-        max_tokens
+        max_tokens,
+        session,
+        output_dir
     )
     
     if result["combined"]:
         output_file = os.path.join(output_dir, "combined_analysis.json")
-        save_json(output_file, result["combined"].model_dump())
+        await asyncio.get_running_loop().run_in_executor(None, save_json, output_file, result["combined"].model_dump())
+        
+    return int(result["total_tokens"])
+
+async def analyze_directories_concurrently(
+    dirs: List[Path],
+    output_dir: str,
+    model_id: str,
+    ignore_patterns: Optional[List[str]] = None,
+    system_prompt: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    session: Optional[httpx.AsyncClient] = None
+) -> int:
+    """Analyze directories individually with bounded concurrency and save results.
+    
+    Args:
+        dirs: List of directory paths
+        output_dir: Directory to save results
+        model_id: Model ID to use
+        ignore_patterns: Patterns to ignore
+        system_prompt: System prompt for model
+        max_tokens: Maximum tokens for response
+        session: Optional shared HTTP client for LLM requests
         
-    return int(result["total_tokens"]) 
\ No newline at end of file
+    Returns:
+        Number of tokens processed across all directories
+    """
+    sem = asyncio.Semaphore(get_concurrency_limit())
+
+    async def _analyze_one(dir_path: Path) -> int:
+        async with sem:
+            return await analyze_directory(
+                dir_path,
+                output_dir,
+                model_id,
+                ignore_patterns,
+                system_prompt,
+                max_tokens,
+                session
+            )
+
+    results = await asyncio.gather(*[_analyze_one(d) for d in dirs], return_exceptions=True)
+
+    total_tokens = 0
+    for dir_path, result in zip(dirs, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Error analyzing {dir_path}: {result}")
+            continue
+        total_tokens += result
+    return total_tokens
@@ -2,13 +2,14 @@
 
 import time
 import sqlite3
-import json
+import threading
 import zlib
 import hashlib
+import orjson
+import zstandard as zstd
 from pathlib import Path
-from typing import Dict, Any, Optional, Union, Iterator, Generator, TypeVar, cast
+from typing import Dict, Any, Iterable, Optional, Union, Iterator, Generator, Tuple, TypeVar, cast
 from dataclasses import dataclass
-from collections import defaultdict
 from contextlib import contextmanager
 from loguru import logger
 
@@ -16,9 +17,101 @@ from loguru import logger
 PACKAGE_ROOT = Path(__file__).parent.parent
 
 # Default compression settings
-DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_LEVEL = 3
 MIN_SIZE_FOR_COMPRESSION = 1024  # 1KB
 
+# Blob formats stored in the ``compressed`` column; 0/1 match legacy boolean rows
+FORMAT_RAW = 0
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+FORMAT_ZSTD_DICT = 3
+
+# zstd dictionary trained once enough entries exist to sample
+DICT_SIZE = 16384
+DICT_TRAINING_SAMPLES = 64
+
+# Run size/age cleanup once per this many get/set calls
+CLEANUP_INTERVAL = 256
+
+# Stored in PRAGMA user_version; version 2 made schema_cache a WITHOUT ROWID table
+SCHEMA_VERSION = 2
+
+SCHEMA_CACHE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        database_name TEXT,
+        collection_name TEXT,
+        analysis_type TEXT,
+        data BLOB,
+        schema_hash TEXT,
+        timestamp REAL,
+        size INTEGER,
+        compressed BOOLEAN,
+        PRIMARY KEY (database_name, collection_name, analysis_type)
+    ) WITHOUT ROWID
+"""
+
+# Hot-path statements, kept as constants so the connection's statement cache reuses them
+STATEMENT_CACHE_SIZE = 256
+
+_SQL_GET = """
+    SELECT data, compressed FROM schema_cache
+    WHERE database_name = ? AND collection_name = ? AND analysis_type = ?
+"""
+
+_SQL_SET = "INSERT OR REPLACE INTO schema_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+_SQL_SUM_SIZE = "SELECT COALESCE(SUM(size), 0) FROM schema_cache"
+
+# Drop everything at or before the newest entry whose running total (newest first)
+# overflows the size limit
+_SQL_DELETE_OVERSIZE = """
+    DELETE FROM schema_cache
+    WHERE timestamp <= (
+        SELECT timestamp FROM (
+            SELECT timestamp, SUM(size) OVER (ORDER BY timestamp DESC) AS running
+            FROM schema_cache
+        )
+        WHERE running > ?
+        ORDER BY timestamp DESC
+        LIMIT 1
+    )
+"""
+
+_SQL_DELETE_EXPIRED = "DELETE FROM schema_cache WHERE timestamp < ?"
+
+# Rows rewritten per page by recompress_all
+RECOMPRESS_BATCH_SIZE = 500
+
+# The first page has no lower bound, so entries keyed by empty strings are included
+_SQL_RECOMPRESS_FIRST_PAGE = """
+    SELECT database_name, collection_name, analysis_type, data, compressed
+    FROM schema_cache
+    ORDER BY database_name, collection_name, analysis_type
+    LIMIT ?
+"""
+
+_SQL_RECOMPRESS_PAGE = """
+    SELECT database_name, collection_name, analysis_type, data, compressed
+    FROM schema_cache
+    WHERE (database_name, collection_name, analysis_type) > (?, ?, ?)
+    ORDER BY database_name, collection_name, analysis_type
+    LIMIT ?
+"""
+
+_SQL_RECOMPRESS_UPDATE = """
+    UPDATE schema_cache SET data = ?, size = ?, compressed = ?
+    WHERE database_name = ? AND collection_name = ? AND analysis_type = ?
+"""
+
+# Per-connection SQLite settings; journal_mode=WAL is persisted in the database file
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64MB
+    "PRAGMA mmap_size=268435456",  # 256MB
+    "PRAGMA busy_timeout=5000",
+)
+
 T = TypeVar('T')
 
 @dataclass
@@ -38,7 +131,7 @@ class TimingManager:
     """Manages timing statistics for schema generator operations."""
 
     def __init__(self) -> None:
-        self.stats: Dict[str, TimingStats] = defaultdict(lambda: TimingStats(""))
+        self.stats: Dict[str, TimingStats] = {}
         self.enabled = True
 
     @contextmanager
@@ -48,19 +141,21 @@ class TimingManager:
             yield
             return
 
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             if description:
-                logger.debug(f"Starting {operation}: {description}")
+                # Positional args are only formatted if the message is emitted
+                logger.debug("Starting {}: {}", operation, description)
             yield
         finally:
-            elapsed = time.time() - start_time
-            if operation not in self.stats:
-                self.stats[operation] = TimingStats(operation)
-            self.stats[operation].total_time += elapsed
-            self.stats[operation].calls += 1
+            elapsed = time.perf_counter() - start_time
+            stat = self.stats.get(operation)
+            if stat is None:
+                stat = self.stats[operation] = TimingStats(operation)
+            stat.total_time += elapsed
+            stat.calls += 1
             if description:
-                logger.debug(f"Completed {operation} in {elapsed:.2f}s")
+                logger.debug("Completed {} in {:.2f}s", operation, elapsed)
 
     def get_summary(self) -> Dict[str, Dict[str, float]]:
         """Get summary of timing statistics."""
@@ -89,7 +184,7 @@ class SchemaCache:
         Args:
             max_age_days: Maximum age of cache entries in days (default: 30)
             max_size_mb: Maximum size of cache in megabytes (default: 100)
-            compression_level: zlib compression level 0-9 (default: 6)
+            compression_level: zstd compression level 1-22 (default: 3)
             cache_dir: Optional custom cache directory
         """
         self.max_age_days = max_age_days
@@ -100,130 +195,229 @@ class SchemaCache:
         self.cache_dir = cache_dir or PACKAGE_ROOT / "cache"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.db_path = self.cache_dir / "schema_analysis_cache.db"
+
+        # One shared connection, serialized by the lock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._zstd_dict: Optional[zstd.ZstdCompressionDict] = None
+        self._next_training_count = DICT_TRAINING_SAMPLES
+        # Rows written since open plus those found at open; replaced and pruned
+        # rows make it an overestimate, so training re-checks with COUNT(*)
+        self._entry_count = 0
+        self._ops_since_cleanup = 0
+        self._cleanup_every = CLEANUP_INTERVAL
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        """Get the shared cache connection, opening it with performance PRAGMAs on first use.
+
+        Callers must hold ``self._lock`` while using the connection.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """Close the shared connection; it is reopened on next use."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("PRAGMA optimize")
+                self._conn.close()
+                self._conn = None
+
     def _init_db(self) -> None:
-        """Initialize the SQLite database."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS schema_cache (
-                    database_name TEXT,
-                    collection_name TEXT,
-                    analysis_type TEXT,
-                    data BLOB,
-                    schema_hash TEXT,
-                    timestamp REAL,
-                    size INTEGER,
-                    compressed BOOLEAN,
-                    PRIMARY KEY (database_name, collection_name, analysis_type)
-                )
-            """)
+        """Initialize the SQLite database, migrating older layouts."""
+        with self._lock, self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_cache'"
+            ).fetchone()
+            if exists and version < SCHEMA_VERSION:
+                # Rebuild the rowid table as WITHOUT ROWID, keeping its entries
+                conn.execute(SCHEMA_CACHE_DDL.format(table="schema_cache_v2"))
+                conn.execute("INSERT INTO schema_cache_v2 SELECT * FROM schema_cache")
+                conn.execute("DROP TABLE schema_cache")
+                conn.execute("ALTER TABLE schema_cache_v2 RENAME TO schema_cache")
+                logger.debug(f"Migrated schema cache to version {SCHEMA_VERSION}")
+            else:
+                conn.execute(SCHEMA_CACHE_DDL.format(table="schema_cache"))
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+            # Covers both the size total and the age/size pruning in cleanup
             conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_timestamp ON schema_cache(timestamp)"
+                "CREATE INDEX IF NOT EXISTS idx_size_ts ON schema_cache(timestamp, size)"
             )
+            conn.execute("DROP INDEX IF EXISTS idx_timestamp")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _meta (id INTEGER PRIMARY KEY, dictionary BLOB)"
+            )
+            row = conn.execute("SELECT dictionary FROM _meta WHERE id = 0").fetchone()
+            if row:
+                self._zstd_dict = zstd.ZstdCompressionDict(row[0])
+            else:
+                self._entry_count = conn.execute("SELECT COUNT(*) FROM schema_cache").fetchone()[0]
 
-    def _compress_data(self, data: bytes) -> bytes:
-        """Compress data using zlib."""
-        return zlib.compress(data, level=self.compression_level)
+    def _compress_data(self, data: bytes) -> Tuple[bytes, int]:
+        """Compress data using zstd, with the trained dictionary when available.
 
-    def _decompress_data(self, data: bytes) -> bytes:
-        """Decompress zlib compressed data."""
-        return zlib.decompress(data)
+        Returns:
+            Tuple of the compressed bytes and their blob format
+        """
+        if self._zstd_dict is not None:
+            compressor = zstd.ZstdCompressor(level=self.compression_level, dict_data=self._zstd_dict)
+            return compressor.compress(data), FORMAT_ZSTD_DICT
+        return zstd.ZstdCompressor(level=self.compression_level).compress(data), FORMAT_ZSTD
+
+    def _decompress_data(self, data: bytes, blob_format: int) -> bytes:
+        """Decompress a blob stored in any supported format."""
+        if blob_format == FORMAT_ZSTD_DICT:
+            return zstd.ZstdDecompressor(dict_data=self._zstd_dict).decompress(data)
+        if blob_format == FORMAT_ZSTD:
+            return zstd.ZstdDecompressor().decompress(data)
+        if blob_format == FORMAT_ZLIB:
+            return zlib.decompress(data)
+        return data
+
+    def _maybe_train_dictionary(self, added: int) -> None:
+        """Train and persist a zstd dictionary once enough entries are cached.
+
+        Args:
+            added: Number of rows just written
+        """
+        with self._lock:
+            if self._zstd_dict is not None:
+                return
+            self._entry_count += added
+            if self._entry_count < self._next_training_count:
+                return
+        try:
+            with self._lock, self._connect() as conn:
+                count = conn.execute("SELECT COUNT(*) FROM schema_cache").fetchone()[0]
+                self._entry_count = count
+                if count < self._next_training_count:
+                    return
+                rows = conn.execute(
+                    "SELECT data, compressed FROM schema_cache LIMIT ?",
+                    (DICT_TRAINING_SAMPLES * 4,)
+                ).fetchall()
+                samples = [self._decompress_data(data, blob_format) for data, blob_format in rows]
+                try:
+                    self._zstd_dict = zstd.train_dictionary(DICT_SIZE, samples)
+                except zstd.ZstdError as e:
+                    # Too little sample data; try again once more entries exist
+                    self._next_training_count = count + DICT_TRAINING_SAMPLES
+                    logger.debug(f"Cache dictionary training skipped: {e}")
+                    return
+                conn.execute(
+                    "INSERT OR REPLACE INTO _meta (id, dictionary) VALUES (0, ?)",
+                    (self._zstd_dict.as_bytes(),)
+                )
+                logger.debug(f"Trained cache compression dictionary from {len(samples)} entries")
+        except Exception as e:
+            logger.debug(f"Cache dictionary training failed: {e}")
 
-    def _calculate_schema_hash(self, data: Dict[str, Any]) -> str:
-        """Calculate hash of schema data to detect changes."""
-        schema_str = json.dumps(data, sort_keys=True)
-        return hashlib.sha256(schema_str.encode()).hexdigest()
+    def _calculate_schema_hash(self, data_blob: bytes) -> str:
+        """Calculate hash of canonically serialized schema data to detect changes."""
+        return hashlib.blake2b(data_blob, digest_size=16).hexdigest()
 
     def get(
         self, database: str, collection: str, analysis_type: str
     ) -> Optional[Dict[str, Any]]:
         """Get cached schema analysis if it exists and is valid."""
-        self._cleanup_if_needed()
+        self._maybe_cleanup()
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._lock, self._connect() as conn:
                 row = conn.execute(
-                    """
-                    SELECT data, compressed FROM schema_cache 
-                    WHERE database_name = ? AND collection_name = ? AND analysis_type = ?
-                    """,
-                    (database, collection, analysis_type)
+                    _SQL_GET, (database, collection, analysis_type)
                 ).fetchone()
 
                 if row:
-                    data, is_compressed = row
-                    if is_compressed:
-                        data = self._decompress_data(data)
-                    return cast(Dict[str, Any], json.loads(data))
+                    data, blob_format = row
+                    data = self._decompress_data(data, blob_format)
+                    return cast(Dict[str, Any], orjson.loads(data))
         except Exception as e:
             logger.error(f"Cache retrieval error: {e}")
         return None
 
+    def _prepare_row(
+        self, database: str, collection: str, analysis_type: str, data: Dict[str, Any]
+    ) -> Tuple[Any, ...]:
+        """Serialize, hash and compress an entry into a schema_cache row."""
+        # Serialize once with sorted keys so the blob doubles as the hash input
+        data_blob = orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        schema_hash = self._calculate_schema_hash(data_blob)
+
+        # Compress if the data is large enough; a trained dictionary pays off on small blobs too
+        blob_format = FORMAT_RAW
+        if self._zstd_dict is not None or len(data_blob) > MIN_SIZE_FOR_COMPRESSION:
+            data_blob, blob_format = self._compress_data(data_blob)
+
+        return (
+            database,
+            collection,
+            analysis_type,
+            data_blob,
+            schema_hash,
+            time.time(),
+            len(data_blob),
+            blob_format,
+        )
+
     def set(
         self, database: str, collection: str, analysis_type: str, data: Dict[str, Any]
     ) -> None:
         """Cache schema analysis result with compression."""
-        try:
-            schema_hash = self._calculate_schema_hash(data)
-            data_blob = json.dumps(data).encode()
+        self.set_many([(database, collection, analysis_type, data)])
 
-            # Compress if the data is large enough
-            should_compress = len(data_blob) > MIN_SIZE_FOR_COMPRESSION
-            if should_compress:
-                data_blob = self._compress_data(data_blob)
+    def set_many(self, entries: Iterable[Tuple[str, str, str, Dict[str, Any]]]) -> None:
+        """Cache several analysis results in a single transaction.
 
-            size = len(data_blob)
-
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    """
-                    INSERT OR REPLACE INTO schema_cache 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        database,
-                        collection,
-                        analysis_type,
-                        data_blob,
-                        schema_hash,
-                        time.time(),
-                        size,
-                        should_compress,
-                    )
-                )
+        Args:
+            entries: (database, collection, analysis_type, data) tuples
+        """
+        try:
+            rows = [self._prepare_row(*entry) for entry in entries]
+            if not rows:
+                return
+            with self._lock, self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(_SQL_SET, rows)
         except Exception as e:
             logger.error(f"Cache storage error: {e}")
+            return
+        self._maybe_cleanup()
+        self._maybe_train_dictionary(len(rows))
+
+    def _maybe_cleanup(self) -> None:
+        """Run cleanup on the first call and then every ``_cleanup_every`` calls."""
+        with self._lock:
+            due = self._ops_since_cleanup % self._cleanup_every == 0
+            self._ops_since_cleanup += 1
+        if due:
+            self._cleanup_if_needed()
 
     def _cleanup_if_needed(self) -> None:
         """Perform cache cleanup if size or age limits are exceeded."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._lock, self._connect() as conn:
                 # Check current cache size
-                total_size = conn.execute(
-                    "SELECT COALESCE(SUM(size), 0) FROM schema_cache"
-                ).fetchone()[0]
+                total_size = conn.execute(_SQL_SUM_SIZE).fetchone()[0]
 
-                if total_size > self.max_size_mb * 1024 * 1024:
+                max_size = self.max_size_mb * 1024 * 1024
+                if total_size > max_size:
                     # Remove oldest entries until under size limit
-                    conn.execute(
-                        """
-                        DELETE FROM schema_cache 
-                        WHERE rowid IN (
-                            SELECT rowid FROM schema_cache 
-                            ORDER BY timestamp ASC 
-                            LIMIT -1 OFFSET ?
-                        )
-                        """,
-                        (self.max_size_mb * 1024 * 1024 // 1000,)
-                    )
+                    conn.execute(_SQL_DELETE_OVERSIZE, (max_size,))
 
                 # Remove expired entries
                 max_age = time.time() - (self.max_age_days * 24 * 60 * 60)
-                conn.execute(
-                    "DELETE FROM schema_cache WHERE timestamp < ?",
-                    (max_age,)
-                )
+                conn.execute(_SQL_DELETE_EXPIRED, (max_age,))
                 conn.commit()
         except Exception as e:
             logger.debug(f"Cache cleanup failed: {e}")
@@ -231,9 +425,10 @@ class SchemaCache:
     def clear(self) -> None:
         """Clear the entire cache."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._lock, self._connect() as conn:
                 conn.execute("DELETE FROM schema_cache")
                 conn.commit()
+                self._entry_count = 0
         except Exception as e:
             logger.debug(f"Cache clear failed: {e}")
 
@@ -250,42 +445,34 @@ class SchemaCache:
         }
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                rows = conn.execute(
-                    """
-                    SELECT database_name, collection_name, analysis_type, data, compressed 
-                    FROM schema_cache
-                    """
-                ).fetchall()
-
-                for db, coll, analysis_type, data, was_compressed in rows:
-                    stats["total"] += 1
-                    original_size = len(data)
-                    stats["size_before"] += original_size
-
-                    # Decompress if needed
-                    if was_compressed:
-                        data = self._decompress_data(data)
-
-                    # Try to compress if large enough
-                    if len(data) > MIN_SIZE_FOR_COMPRESSION:
-                        compressed_data = self._compress_data(data)
-                        new_size = len(compressed_data)
-                        stats["size_after"] += new_size
-                        stats["compressed"] += 1
-
-                        conn.execute(
-                            """
-                            UPDATE schema_cache 
-                            SET data = ?, size = ?, compressed = 1
-                            WHERE database_name = ? AND collection_name = ? AND analysis_type = ?
-                            """,
-                            (compressed_data, new_size, db, coll, analysis_type)
-                        )
-                    else:
-                        stats["size_after"] += len(data)
-
-                conn.commit()
+            with self._lock, self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Page through the table by primary key so only one batch is in memory
+                rows = conn.execute(_SQL_RECOMPRESS_FIRST_PAGE, (RECOMPRESS_BATCH_SIZE,)).fetchall()
+                while rows:
+                    last_key = rows[-1][:3]
+
+                    updates = []
+                    for db, coll, analysis_type, data, blob_format in rows:
+                        stats["total"] += 1
+                        original_size = len(data)
+                        stats["size_before"] += original_size
+
+                        # Decompress if needed
+                        data = self._decompress_data(data, blob_format)
+
+                        # Try to compress if large enough
+                        if self._zstd_dict is not None or len(data) > MIN_SIZE_FOR_COMPRESSION:
+                            compressed_data, new_format = self._compress_data(data)
+                            new_size = len(compressed_data)
+                            stats["size_after"] += new_size
+                            stats["compressed"] += 1
+                            updates.append((compressed_data, new_size, new_format, db, coll, analysis_type))
+                        else:
+                            stats["size_after"] += len(data)
+
+                    conn.executemany(_SQL_RECOMPRESS_UPDATE, updates)
+                    rows = conn.execute(_SQL_RECOMPRESS_PAGE, (*last_key, RECOMPRESS_BATCH_SIZE)).fetchall()
         except Exception as e:
             logger.error(f"Recompression failed: {e}")
 
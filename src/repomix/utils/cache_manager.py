@@ -1,85 +1,12 @@
 """Cache initialization for repomix."""
 
-import os
 from loguru import logger
-import redis
 import litellm
 from repomix.utils.file_utils import load_env_file
+from repomix.utils.llm import initialize_litellm_cache
 
 load_env_file()
 
-def initialize_litellm_cache() -> None:
-    """Initialize LiteLLM's built-in caching functionality."""
-    try:
-        logger.debug("Starting LiteLLM cache initialization...")
-
-        # Get Redis configuration from environment
-        redis_host = os.environ.get("REDIS_HOST", "localhost")
-        redis_port = int(os.environ.get("REDIS_PORT", "6379"))
-        redis_password = os.environ.get("REDIS_PASSWORD")
-
-        # Test Redis connection before enabling caching
-        logger.debug("Testing Redis connection...")
-        test_redis = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            password=redis_password,
-            socket_timeout=2
-        )
-        if not test_redis.ping():
-            raise ConnectionError("Redis is not responding.")
-
-        # Verify Redis is empty or log existing keys
-        keys = test_redis.keys("*")
-        if keys:
-            logger.debug(f"Existing Redis keys: {keys}")
-        else:
-            logger.debug("Redis cache is empty")
-
-        # Set up LiteLLM cache with debug logging
-        logger.debug("Configuring LiteLLM Redis cache...")
-        litellm.cache = litellm.Cache(
-            type="redis",
-            host=redis_host,
-            port=redis_port,
-            password=redis_password,
-            supported_call_types=["acompletion", "completion"],
-            ttl=60 * 60 * 24 * 2,  # 2 days
-        )
-
-        # Enable caching and verify
-        logger.debug("Enabling LiteLLM cache...")
-        litellm.enable_cache()
-
-        # Set debug logging for LiteLLM
-        os.environ["LITELLM_LOG"] = "DEBUG"
-
-        # Verify cache configuration
-        logger.debug(
-            f"LiteLLM cache config: {litellm.cache.__dict__ if hasattr(litellm.cache, '__dict__') else 'No cache config available'}"
-        )
-        logger.info("✅ Redis caching enabled on localhost:6379")
-
-        # Try a test set/get to verify Redis is working
-        try:
-            test_key = "litellm_cache_test"
-            test_redis.set(test_key, "test_value", ex=60)
-            result = test_redis.get(test_key)
-            logger.debug(f"Redis test write/read successful: {result == b'test_value'}")
-            test_redis.delete(test_key)
-        except Exception as e:
-            logger.warning(f"Redis test write/read failed: {e}")
-
-    except (redis.ConnectionError, redis.TimeoutError) as e:
-        logger.warning(
-            f"⚠️ Redis connection failed: {e}. Falling back to in-memory caching."
-        )
-        # Fall back to in-memory caching if Redis is unavailable
-        logger.debug("Configuring in-memory cache fallback...")
-        litellm.cache = litellm.Cache(type="local")
-        litellm.enable_cache()
-        logger.debug("In-memory cache enabled")
-
 def test_litellm_cache():
     """Test the LiteLLM cache functionality with a sample completion call"""
     initialize_litellm_cache()
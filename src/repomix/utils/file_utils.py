@@ -9,14 +9,45 @@ This module provides a comprehensive set of file operations utilities:
 """
 
 import os
-import json
+import re
 import mimetypes
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Union, Optional, List, Any
+from typing import Union, Optional, List, Any, Tuple, Pattern, Iterator
+import orjson
 from loguru import logger
 from dotenv import load_dotenv
 
+# Files larger than this are left out of collected content
+MAX_CONTENT_FILE_SIZE = 1024 * 1024  # 1MB
+
+# Leading bytes checked for NUL when sniffing binary files
+BINARY_SNIFF_SIZE = 1024
+
+# Extensions treated as text without sniffing the content
+TEXT_EXTENSIONS = frozenset({
+    'txt', 'md', 'py', 'js', 'ts', 'java', 'c', 'cpp', 'h', 'hpp',
+    'css', 'html', 'xml', 'json', 'yaml', 'yml', 'ini', 'conf',
+    'sh', 'bash', 'zsh', 'fish', 'bat', 'ps1', 'rb', 'php', 'go',
+    'rs', 'scala', 'kt', 'kts', 'swift', 'r', 'pl', 'pm', 'sql'
+})
+
+# Extensions treated as binary without sniffing the content
+BINARY_EXTENSIONS = frozenset({
+    'pyc', 'pyo', 'pyd', 'so', 'dll', 'dylib', 'exe', 'bin', 'o', 'a',
+    'class', 'jar', 'whl', 'sqlite', 'sqlite3',
+    'png', 'jpg', 'jpeg', 'gif', 'bmp', 'ico', 'webp', 'pdf', 'woff',
+    'woff2', 'ttf', 'otf', 'eot', 'zip', 'gz', 'tar', 'bz2', 'xz', '7z',
+    'rar', 'mp3', 'mp4', 'wav', 'avi', 'mov', 'npy', 'npz', 'pkl', 'parquet'
+})
+
+# Upper bound on threads used to read files for collect_content
+MAX_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
 # Project Configuration
+@lru_cache(maxsize=None)
 def get_project_root(marker_file: str = ".git") -> Path:
     """Find the project root directory by looking for a marker file.
 
@@ -36,9 +67,13 @@ def get_project_root(marker_file: str = ".git") -> Path:
         current_dir = current_dir.parent
     raise RuntimeError(f"Could not find project root. Ensure {marker_file} exists.")
 
+@lru_cache(maxsize=None)
 def load_env_file(env_name: Optional[str] = None) -> None:
     """Load environment variables from a .env file.
 
+    Each env file is loaded once per process; a missing file is retried on
+    the next call.
+
     Args:
         env_name (str, optional): Environment name suffix to look for.
             If provided, looks for .env.{env_name}. Otherwise looks for .env
@@ -61,6 +96,12 @@ def load_env_file(env_name: Optional[str] = None) -> None:
     )
 
 # File Operations
+def normalize_newlines(content: str) -> str:
+    """Convert CRLF and lone CR line endings to LF, as text-mode universal newlines do."""
+    if '\r' not in content:
+        return content
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
 def read_file(file_path: Union[str, Path]) -> str:
     """Read a file and return its contents as a string.
     
@@ -75,10 +116,10 @@ def read_file(file_path: Union[str, Path]) -> str:
         IOError: If there are issues reading the file
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            logger.debug(f"Successfully read file: {file_path} (size: {len(content)} bytes)")
-            return content
+        # One sized read and a C-level decode instead of a TextIOWrapper
+        content = normalize_newlines(Path(file_path).read_bytes().decode('utf-8'))
+        logger.debug("Successfully read file: {} (size: {} bytes)", file_path, len(content))
+        return content
     except FileNotFoundError as e:
         logger.error(f"File not found: {file_path}")
         raise FileNotFoundError(f"File not found: {file_path}") from e
@@ -101,9 +142,8 @@ def write_file(file_path: Union[str, Path], content: str) -> None:
     """
     try:
         os.makedirs(os.path.dirname(str(file_path)), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-            logger.debug(f"Successfully wrote file: {file_path}")
+        Path(file_path).write_bytes(content.encode('utf-8'))
+        logger.debug(f"Successfully wrote file: {file_path}")
     except Exception as e:
         logger.error(f"Error writing file {file_path}: {e}")
         raise
@@ -122,8 +162,8 @@ def save_json(file_path: Union[str, Path], data: Any) -> None:
     """
     try:
         os.makedirs(os.path.dirname(str(file_path)), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             logger.debug(f"Successfully saved JSON to: {file_path}")
     except Exception as e:
         logger.error(f"Error saving JSON to {file_path}: {e}")
@@ -143,24 +183,113 @@ def load_json(file_path: Union[str, Path]) -> Any:
         JSONDecodeError: If the file contains invalid JSON
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
             logger.debug(f"Successfully loaded JSON from: {file_path}")
             return data
     except Exception as e:
         logger.error(f"Error loading JSON from {file_path}: {e}")
         raise
 
+# Ignore Pattern Matching
+@lru_cache(maxsize=512)
+def _translate_glob(pattern: str) -> str:
+    """Translate a glob into a regex with ``Path.match`` semantics.
+
+    Relative patterns match the trailing path segments, absolute patterns the
+    whole path. Wildcards never cross a ``/``.
+    """
+    pattern = pattern.rstrip('/') if pattern != '/' else pattern
+    if pattern.startswith('./'):
+        pattern = pattern[2:]
+
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            j = i
+            if j < n and pattern[j] == '!':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                parts.append('\\[')
+                continue
+            stuff = pattern[i:j].replace('\\', '\\\\')
+            if stuff.startswith('!'):
+                stuff = '^/' + stuff[1:].replace(']', '\\]')
+            elif stuff.startswith('^'):
+                stuff = '\\' + stuff
+            parts.append(f'[{stuff}]')
+            i = j + 1
+        else:
+            parts.append(re.escape(c))
+
+    anchor = '^' if pattern.startswith('/') else '(?:^|/)'
+    return f"{anchor}{''.join(parts)}$"
+
+@lru_cache(maxsize=32)
+def compile_ignore_patterns(patterns: Tuple[str, ...]) -> Optional[Pattern[str]]:
+    """Compile glob patterns into a single alternation regex.
+
+    Args:
+        patterns: Tuple of glob patterns (hashable so results can be cached)
+
+    Returns:
+        Optional[Pattern[str]]: Compiled regex, or None if there are no patterns
+    """
+    translated = [_translate_glob(p) for p in patterns if p]
+    if not translated:
+        return None
+    return re.compile('|'.join(f'(?:{t})' for t in translated))
+
+def directory_patterns(patterns: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Derive the patterns that exclude a whole directory from ignore patterns.
+
+    "dir/*" and "dir/**" exclude everything under "dir", and a bare name
+    without wildcards such as "__pycache__" names the directory itself, so a
+    walk can skip the matching directory instead of descending into it.
+    Wildcard patterns like "*.log" are meant for files and never prune.
+
+    Args:
+        patterns: Tuple of glob patterns
+
+    Returns:
+        Tuple[str, ...]: Patterns to match against directory paths
+    """
+    stripped = []
+    for pattern in patterns:
+        for suffix in ('/**', '/*'):
+            if pattern.endswith(suffix):
+                pattern = pattern[:-len(suffix)]
+                break
+        else:
+            if any(c in pattern for c in '*?['):
+                continue
+        if pattern:
+            stripped.append(pattern)
+    return tuple(stripped)
+
 # Directory Operations
 def collect_files(
     directory: Union[str, Path],
-    ignore_patterns: Optional[List[str]] = None
+    ignore_patterns: Optional[List[str]] = None,
+    max_file_size: Optional[int] = None
 ) -> List[Path]:
     """Collect all files in a directory, respecting ignore patterns.
     
     Args:
         directory: Directory to scan
         ignore_patterns: List of glob patterns to ignore
+        max_file_size: Skip files larger than this many bytes
 
     Returns:
         List[Path]: List of file paths found
@@ -168,19 +297,88 @@ def collect_files(
     Raises:
         FileNotFoundError: If directory doesn't exist
     """
+    return [Path(entry.path) for entry in collect_files_iter(directory, ignore_patterns, max_file_size)]
+
+def collect_files_iter(
+    directory: Union[str, Path],
+    ignore_patterns: Optional[List[str]] = None,
+    max_file_size: Optional[int] = None
+) -> Iterator[os.DirEntry]:
+    """Lazily yield the scanned entries of the files collect_files would return.
+    
+    Args:
+        directory: Directory to scan
+        ignore_patterns: List of glob patterns to ignore
+        max_file_size: Skip files larger than this many bytes
+
+    Returns:
+        Iterator[os.DirEntry]: Entries in the same order as collect_files
+
+    Raises:
+        FileNotFoundError: If directory doesn't exist (raised on the call, not on iteration)
+    """
     directory = Path(directory)
     if not directory.exists():
         raise FileNotFoundError(f"Directory not found: {directory}")
+    return _scan_files(os.fspath(directory), tuple(ignore_patterns or ()), max_file_size)
+
+def _scan_files(root: str, patterns: Tuple[str, ...], max_file_size: Optional[int]) -> Iterator[os.DirEntry]:
+    """Walk ``root`` depth-first with os.scandir, yielding entries for the files to keep."""
+    # Compile once for the whole walk; ignored directories are pruned rather
+    # than descended into
+    ignore_re = compile_ignore_patterns(patterns)
+    dir_re = compile_ignore_patterns(directory_patterns(patterns))
     
-    files = []
-    for root, _, filenames in os.walk(directory):
-        for filename in filenames:
-            file_path = Path(root) / filename
-            if ignore_patterns and any(file_path.match(pattern) for pattern in ignore_patterns):
-                logger.debug(f"Ignoring file: {file_path}")
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.debug("Cannot scan directory {}: {}", current, e)
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            posix_path = entry.path.replace(os.sep, '/')
+            # DirEntry caches its type from the scan, so these checks don't stat
+            if entry.is_dir(follow_symlinks=False):
+                if dir_re is not None and dir_re.search(posix_path):
+                    logger.debug("Ignoring directory: {}", entry.path)
+                    continue
+                subdirs.append(entry.path)
+            elif not entry.is_file():
+                # Symlinked directories, dangling links and special files
                 continue
-            files.append(file_path)
-    return files
+            elif ignore_re is not None and ignore_re.search(posix_path):
+                logger.debug("Ignoring file: {}", entry.path)
+            elif max_file_size is not None and _entry_size(entry) > max_file_size:
+                logger.debug("Skipping large file: {}", entry.path)
+            else:
+                yield entry
+        
+        # Reverse so directories are visited in scan order (top-down, like os.walk)
+        stack.extend(reversed(subdirs))
+
+def _entry_size(entry: os.DirEntry) -> int:
+    """Size of a scanned file from its cached stat, or 0 if it cannot be stat-ed."""
+    try:
+        return entry.stat().st_size
+    except OSError:
+        return 0
+
+def _read_text_or_none(file_path: Path) -> Optional[str]:
+    """Read a text file for collect_content, or None if it is binary or unreadable."""
+    # Skip binary files
+    if is_binary_file(file_path):
+        logger.debug("Skipping binary file: {}", file_path)
+        return None
+    try:
+        return read_file(file_path)
+    except Exception as e:
+        logger.warning(f"Error reading {file_path}: {e}")
+        return None
 
 def collect_content(directory: Union[str, Path], ignore_patterns: List[str]) -> str:
     """Collect and concatenate content from all text files in a directory.
@@ -192,23 +390,23 @@ def collect_content(directory: Union[str, Path], ignore_patterns: List[str]) ->
     Returns:
         str: Concatenated content from all text files
     """
-    content = ""
     directory = Path(directory)
-    
-    for file_path in collect_files(directory, ignore_patterns):
-        # Skip large or binary files
-        if file_path.stat().st_size > 1024 * 1024 or is_binary_file(file_path):
-            logger.debug(f"Skipping large or binary file: {file_path}")
+    files = collect_files(directory, ignore_patterns, max_file_size=MAX_CONTENT_FILE_SIZE)
+    if not files:
+        return ""
+
+    # Reads are independent and release the GIL; map keeps the original order
+    with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(files))) as executor:
+        contents = list(executor.map(_read_text_or_none, files))
+
+    parts: List[str] = []
+    for file_path, file_content in zip(files, contents):
+        if file_content is None:
             continue
-            
-        try:
-            file_content = read_file(file_path)
-            content += f"\n\n=== {file_path.relative_to(directory)} ===\n\n"
-            content += file_content
-        except Exception as e:
-            logger.warning(f"Error reading {file_path}: {e}")
+        parts.append(f"\n\n=== {file_path.relative_to(directory)} ===\n\n")
+        parts.append(file_content)
                 
-    return content.strip()
+    return "".join(parts).strip()
 
 def clean_directory(directory: Union[str, Path]) -> None:
     """Remove all files and subdirectories in a directory.
@@ -221,24 +419,41 @@ def clean_directory(directory: Union[str, Path]) -> None:
     """
     directory = Path(directory)
     if directory.exists():
-        # First remove all files
-        for item in directory.iterdir():
-            if item.is_file():
-                item.unlink()
-                
-        # Then recursively handle subdirectories
-        for item in directory.iterdir():
-            if item.is_dir():
-                clean_directory(item)
-                
-        # Finally remove the directory itself
-        directory.rmdir()
+        shutil.rmtree(directory)
 
 # File Type Detection
 def get_file_extension(file_path: Union[str, Path]) -> str:
     """Get file extension (lowercase, without dot)."""
     return os.path.splitext(str(file_path))[1].lower().lstrip('.')
 
+@lru_cache(maxsize=1024)
+def _guess_mime_type(suffixes: str) -> Optional[str]:
+    """Guess a MIME type from a file's trailing suffixes, memoized per suffix string.
+
+    mimetypes only looks at the last suffix, or the last two for encodings
+    such as ``.tar.gz``, so those are all that is needed as the key.
+    """
+    return mimetypes.guess_type(f"file{suffixes}")[0]
+
+def has_binary_mime_type(file_path: Union[str, Path]) -> bool:
+    """Check if a file's extension maps to a non-text MIME type, without opening it."""
+    mime_type = _guess_mime_type("".join(Path(file_path).suffixes[-2:]))
+    return bool(mime_type) and not mime_type.startswith('text/')
+
+def binary_by_extension(file_path: Union[str, Path]) -> Optional[bool]:
+    """Decide whether a file is binary from its extension alone.
+    
+    Returns:
+        Optional[bool]: True or False when the extension settles it, None when
+        the content has to be checked
+    """
+    extension = get_file_extension(file_path)
+    if extension in BINARY_EXTENSIONS or has_binary_mime_type(file_path):
+        return True
+    if extension in TEXT_EXTENSIONS:
+        return False
+    return None
+
 def is_binary_file(file_path: Union[str, Path]) -> bool:
     """Check if a file is binary using MIME type and content analysis.
     
@@ -249,15 +464,17 @@ def is_binary_file(file_path: Union[str, Path]) -> bool:
         bool: True if the file is binary, False if it's text
     """
     try:
-        # Check MIME type first
-        mime_type, _ = mimetypes.guess_type(str(file_path))
-        if mime_type and not mime_type.startswith('text/'):
+        # Check the extension and MIME type first
+        if binary_by_extension(file_path):
             return True
             
-        # Then check for null bytes
-        with open(file_path, 'rb') as f:
-            chunk = f.read(1024)
-            return b'\0' in chunk
+        # Then check for null bytes (find is a C memchr over the raw block)
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            chunk = os.read(fd, BINARY_SNIFF_SIZE)
+        finally:
+            os.close(fd)
+        return chunk.find(b'\0') != -1
     except Exception as e:
         logger.warning(f"Error checking if file is binary {file_path}: {e}")
         return True  # Assume binary if we can't read the file
@@ -271,19 +488,8 @@ def is_text_file(file_path: Union[str, Path]) -> bool:
     Returns:
         bool: True if the file is text, False if it's binary
     """
-    text_extensions = {
-        'txt', 'md', 'py', 'js', 'ts', 'java', 'c', 'cpp', 'h', 'hpp',
-        'css', 'html', 'xml', 'json', 'yaml', 'yml', 'ini', 'conf',
-        'sh', 'bash', 'zsh', 'fish', 'bat', 'ps1', 'rb', 'php', 'go',
-        'rs', 'scala', 'kt', 'kts', 'swift', 'r', 'pl', 'pm', 'sql'
-    }
-    
-    extension = get_file_extension(file_path)
-    if extension in text_extensions:
-        return True
-        
-    # For unknown extensions, check content
-    return not is_binary_file(file_path)
+    # Known text extensions skip the content check
+    return get_file_extension(file_path) in TEXT_EXTENSIONS or not is_binary_file(file_path)
 
 if __name__ == "__main__":
     load_env_file()
@@ -2,6 +2,7 @@
 
 import os
 import re
+import shutil
 import tempfile
 from pathlib import Path
 from typing import Tuple, Optional, List
@@ -11,6 +12,19 @@ import click
 from git import Repo
 from dataclasses import dataclass
 import asyncio
+import weakref
+from functools import lru_cache
+
+try:
+    import pygit2
+except ImportError:  # Optional: falls back to the git CLI
+    pygit2 = None
+
+# Leave a quarter of the cores free so concurrent clones don't fork-storm the host
+MAX_CLONE_WORKERS = max(1, (os.cpu_count() or 4) * 3 // 4)
+_clone_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+GITHUB_URL_RE = re.compile(r"^@?https?://github\.com/[^/]+/[^/]+(/.*)?$")
 
 @dataclass
 class RepoInfo:
@@ -19,6 +33,7 @@ class RepoInfo:
     branch: str
     target_dirs: List[str]
 
+@lru_cache(maxsize=1024)
 def parse_github_url(url: str) -> Tuple[str, Optional[str], str]:
     """Parse a GitHub repository URL or local path into components.
     
@@ -71,12 +86,29 @@ def parse_github_url(url: str) -> Tuple[str, Optional[str], str]:
         logger.error(f"Error parsing URL or path: {e}")
         raise ValueError(f"Invalid URL or path: {url}") from e
 
-def clone_repository(repo_url: str, branch: str) -> Path:
+def _clone_commands(repo_url: str, branch: str, repo_dir: Path, target_dirs: Optional[List[str]]) -> List[List[str]]:
+    """Build the git commands that clone ``repo_url`` into ``repo_dir``.
+    
+    When ``target_dirs`` is given, the clone is partial (``--filter=blob:none``)
+    and sparse, so only the blobs under those directories are fetched.
+    """
+    sparse_paths = [d.strip("/") for d in target_dirs or () if d.strip("/")]
+    if not sparse_paths:
+        return [["git", "clone", "-b", branch, "--depth", "1", repo_url, str(repo_dir)]]
+    return [
+        ["git", "clone", "--filter=blob:none", "--sparse", "-b", branch, "--depth", "1",
+         repo_url, str(repo_dir)],
+        ["git", "-C", str(repo_dir), "sparse-checkout", "set", *sparse_paths]
+    ]
+
+def clone_repository(repo_url: str, branch: str, target_dirs: Optional[List[str]] = None) -> Path:
     """Clone a GitHub repository to a temporary directory.
     
     Args:
         repo_url: GitHub repository URL
         branch: Branch to clone
+        target_dirs: Optional directories within the repository to check out;
+            when given, only their blobs are fetched
         
     Returns:
         Path to the cloned repository
@@ -89,12 +121,8 @@ def clone_repository(repo_url: str, branch: str) -> Path:
     
     try:
         logger.info(f"Cloning {repo_url} ({branch}) to {repo_dir}")
-        subprocess.run(
-            ["git", "clone", "-b", branch, "--depth", "1", repo_url, str(repo_dir)],
-            check=True,
-            capture_output=True,
-            text=True
-        )
+        for command in _clone_commands(repo_url, branch, repo_dir, target_dirs):
+            subprocess.run(command, check=True, capture_output=True, text=True)
         return repo_dir
         
     except subprocess.CalledProcessError as e:
@@ -102,6 +130,46 @@ def clone_repository(repo_url: str, branch: str) -> Path:
         cleanup_repository(repo_dir)  # Clean up on failure
         raise click.ClickException(f"Failed to clone repository: {e.stderr}")
 
+async def clone_repository_async(repo_url: str, branch: str, target_dirs: Optional[List[str]] = None) -> Path:
+    """Clone a GitHub repository without blocking the event loop.
+    
+    Async counterpart of clone_repository; clones share the
+    MAX_CLONE_WORKERS limit with clone_github_repo.
+    
+    Args:
+        repo_url: GitHub repository URL
+        branch: Branch to clone
+        target_dirs: Optional directories within the repository to check out
+        
+    Returns:
+        Path to the cloned repository
+        
+    Raises:
+        click.ClickException: If cloning fails
+    """
+    repo_dir = Path(tempfile.mkdtemp(prefix="repomix_"))
+    
+    try:
+        logger.info(f"Cloning {repo_url} ({branch}) to {repo_dir}")
+        async with _clone_semaphore():
+            for command in _clone_commands(repo_url, branch, repo_dir, target_dirs):
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                _, stderr = await process.communicate()
+                if process.returncode != 0:
+                    error = stderr.decode(errors="replace")
+                    logger.error(f"Git clone failed: {error}")
+                    raise click.ClickException(f"Failed to clone repository: {error}")
+        return repo_dir
+        
+    except BaseException:
+        # Also covers a missing git executable and cancellation mid-clone
+        cleanup_repository(repo_dir)  # Clean up on failure
+        raise
+
 def cleanup_repository(repo_dir: Path) -> None:
     """Clean up a cloned repository.
     
@@ -110,20 +178,22 @@ def cleanup_repository(repo_dir: Path) -> None:
     """
     try:
         logger.info(f"Cleaning up repository at {repo_dir}")
-        if repo_dir.exists():
-            subprocess.run(
-                ["rm", "-rf", str(repo_dir)],
-                check=True,
-                capture_output=True,
-                text=True
-            )
-    except subprocess.CalledProcessError as e:
-        logger.warning(f"Cleanup failed: {e.stderr}")
+        shutil.rmtree(repo_dir)
+    except FileNotFoundError:
+        pass  # Already gone
+    except OSError as e:
+        logger.warning(f"Cleanup failed: {e}")
 
 def is_github_url(url: str) -> bool:
     """Check if a string is a GitHub URL."""
-    github_pattern = r"^@?https?://github\.com/[^/]+/[^/]+(/.*)?$"
-    return bool(re.match(github_pattern, url))
+    return GITHUB_URL_RE.match(url) is not None
+
+def _parse_tree_url(url: str) -> Tuple[str, str, str]:
+    """Parse a GitHub ``/tree/<branch>/...`` URL, requiring the branch."""
+    repo_url, branch, target_dir = parse_github_url(url)
+    if branch is None:
+        raise ValueError("Invalid GitHub URL format")
+    return repo_url, branch, target_dir
 
 def parse_multi_urls(urls: List[str]) -> RepoInfo:
     """Parse multiple GitHub URLs or directory paths.
@@ -143,65 +213,52 @@ def parse_multi_urls(urls: List[str]) -> RepoInfo:
     # Strip @ prefix if present
     cleaned_urls = [url[1:] if url.startswith('@') else url for url in urls]
 
-    # Check if all URLs are GitHub URLs
-    is_github = all(url.startswith('https://github.com/') for url in cleaned_urls)
-    is_local = all(not url.startswith('https://github.com/') for url in cleaned_urls)
-
-    if not (is_github or is_local):
+    # Every URL must be the same kind as the first
+    is_github = cleaned_urls[0].startswith('https://github.com/')
+    if any(url.startswith('https://github.com/') != is_github for url in cleaned_urls):
         raise ValueError("All URLs must be from the same repository")
 
     if is_github:
-        # Extract repository URL and branch from the first URL
-        first_url = cleaned_urls[0]
-        parts = first_url.split('/tree/')
-        if len(parts) != 2:
-            raise ValueError("Invalid GitHub URL format")
-        
-        repo_url = parts[0]
-        branch_and_path = parts[1].split('/', 1)
-        branch = branch_and_path[0]
-        
-        # Validate all URLs have the same repository and branch
-        for url in cleaned_urls[1:]:
-            parts = url.split('/tree/')
-            if len(parts) != 2:
-                raise ValueError("Invalid GitHub URL format")
-            
-            curr_repo = parts[0]
-            curr_branch = parts[1].split('/', 1)[0]
-            
-            if curr_repo != repo_url:
+        # One pass: take repository and branch from the first URL, check the
+        # rest against it and collect every target directory
+        repo_url, branch = None, None
+        target_dirs = []
+        for url in cleaned_urls:
+            curr_repo, curr_branch, target_dir = _parse_tree_url(url)
+            if repo_url is None:
+                repo_url, branch = curr_repo, curr_branch
+            elif curr_repo != repo_url:
                 raise ValueError("All URLs must be from the same repository")
-            if curr_branch != branch:
+            elif curr_branch != branch:
                 raise ValueError("All URLs must use the same branch")
-        
-        # Extract target directories
-        target_dirs = [url.split('/tree/')[1].split('/', 1)[1] for url in cleaned_urls]
+            target_dirs.append(target_dir.lstrip('/'))
     else:
-        # Handle local paths
-        paths = [Path(url) for url in cleaned_urls]
+        # Handle local paths as plain strings; normpath gives the same
+        # cleanup Path() did without allocating path objects
+        paths = [os.path.normpath(url) for url in cleaned_urls]
         
         # For single path, use the parent directory as repo_url
         if len(paths) == 1:
             path = paths[0]
-            if path.is_absolute():
-                repo_url = str(path.parent)
-                target_dirs = [path.name]
+            if os.path.isabs(path):
+                repo_url, name = os.path.split(path)
+                target_dirs = [name]
             else:
-                parts = str(path).split('/', 1)
+                parts = path.split('/', 1)
                 repo_url = parts[0]
                 target_dirs = [parts[1]] if len(parts) > 1 else ['.']
         else:
             # Find the common parent directory
-            common_parent = os.path.commonpath([str(p) for p in paths])
+            common_parent = os.path.commonpath(paths)
             if not common_parent or common_parent == '.':
                 # If no common parent, use the first directory as repo_url
-                parts = str(paths[0]).split('/', 1)
-                repo_url = parts[0]
-                target_dirs = [str(Path(url).relative_to(repo_url)) for url in cleaned_urls]
+                repo_url = paths[0].split('/', 1)[0]
             else:
                 repo_url = common_parent
-                target_dirs = [str(Path(url).relative_to(common_parent)) for url in cleaned_urls]
+            target_dirs = [os.path.relpath(path, repo_url) for path in paths]
+            outside = [path for path, rel in zip(paths, target_dirs) if rel.startswith('..')]
+            if outside:
+                raise ValueError(f"'{outside[0]}' is not within '{repo_url}'")
         
         branch = "master"  # Default branch for local paths
 
@@ -211,6 +268,22 @@ def parse_multi_urls(urls: List[str]) -> RepoInfo:
         target_dirs=target_dirs
     )
 
+def _clone_semaphore() -> asyncio.Semaphore:
+    """Get the clone semaphore for the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _clone_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _clone_semaphores[loop] = asyncio.Semaphore(MAX_CLONE_WORKERS)
+    return semaphore
+
+def _pygit2_clone(clone_url: str, path: str) -> None:
+    """Clone with pygit2, authenticating with GITHUB_TOKEN when it is set."""
+    callbacks = None
+    token = os.environ.get("GITHUB_TOKEN")
+    if token:
+        callbacks = pygit2.RemoteCallbacks(credentials=pygit2.UserPass("x-access-token", token))
+    pygit2.clone_repository(clone_url, path, callbacks=callbacks)
+
 async def clone_github_repo(url: str) -> str:
     """Clone a GitHub repository to a temporary directory.
     
@@ -227,18 +300,29 @@ async def clone_github_repo(url: str) -> str:
     temp_dir = tempfile.mkdtemp(prefix="repomix_")
     
     try:
-        # Run git clone in a subprocess to avoid blocking
-        process = await asyncio.create_subprocess_exec(
-            "git", "clone", clone_url, temp_dir,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
+        async with _clone_semaphore():
+            if pygit2 is not None:
+                # libgit2 clones in-process, in a worker thread, without a fork/exec
+                await asyncio.get_running_loop().run_in_executor(None, _pygit2_clone, clone_url, temp_dir)
+                return temp_dir
+            
+            # Run git clone in a subprocess to avoid blocking
+            process = await asyncio.create_subprocess_exec(
+                "git", "clone", clone_url, temp_dir,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await process.communicate()
         
         if process.returncode != 0:
             raise ValueError(f"Git clone failed: {stderr.decode()}")
             
         return temp_dir
     except Exception as e:
+        cleanup_repository(Path(temp_dir))  # Clean up on failure
         logger.error(f"Error cloning repository: {e}")
-        raise ValueError(f"Failed to clone repository: {e}") 
\ No newline at end of file
+        raise ValueError(f"Failed to clone repository: {e}") 
+    except BaseException:
+        # Cancelled mid-clone
+        cleanup_repository(Path(temp_dir))
+        raise
@@ -125,7 +125,7 @@ def parse_json(content: str, logger=None) -> Union[dict, list, str]:
         logger.error(f"JSON decode error after repair attempt: {e}")
     except Exception as e:
         logger.error(f"Failed to parse JSON response: {e}")
-    logger.debug(f"Returning original content as string: {content}")
+    logger.debug("Returning original content as string: {}", content)
     return content
 
 
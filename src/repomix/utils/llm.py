@@ -1,45 +1,146 @@
 """LLM integration using LiteLLM with Redis caching."""
 
 import os
+import json
 import uuid
+import atexit
+import asyncio
+import hashlib
+from functools import lru_cache
+from pathlib import Path
 from typing import Union, AsyncGenerator, Optional, Any
+import httpx
+import orjson
 import redis
 import litellm
 from loguru import logger
 
 from repomix.utils.models import LLMResponse, TokenUsage
 
-def initialize_litellm_cache():
+# Connection pool sized for concurrent directory analysis
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=75)
+HTTP_TIMEOUT = httpx.Timeout(600.0)
+REDIS_MAX_CONNECTIONS = 16
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled async HTTP client for LiteLLM calls."""
+    return httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+def configure_http_client() -> httpx.AsyncClient:
+    """Share one pooled async HTTP client across LiteLLM calls on the running event loop.
+    
+    Pooled connections are bound to the loop that opened them, so a new client
+    is created whenever the running loop changes.
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = create_http_client()
+        _http_client_loop = loop
+        logger.debug("Configured shared HTTP client for LiteLLM")
+    litellm.aclient_session = _http_client
+    return _http_client
+
+@atexit.register
+def _close_http_client() -> None:
+    """Close the shared HTTP client on interpreter exit."""
+    if _http_client is None or _http_client.is_closed:
+        return
+    try:
+        asyncio.run(_http_client.aclose())
+    except Exception as e:
+        logger.debug(f"Failed to close shared HTTP client: {e}")
+
+def get_response_cache_dir() -> Path:
+    """Directory for cached LLM responses (REPOMIX_CACHE_DIR, default ~/.cache/repomix)."""
+    return Path(os.getenv("REPOMIX_CACHE_DIR", Path.home() / ".cache" / "repomix")) / "llm"
+
+def response_cache_key(
+    model: str,
+    content: str,
+    system_prompt: Optional[str] = None,
+    max_tokens: Optional[int] = None
+) -> str:
+    """Build a cache key from the model, prompt settings and a digest of the content."""
+    content_digest = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+    key_material = json.dumps([model, system_prompt or "", max_tokens, content_digest])
+    return hashlib.blake2b(key_material.encode("utf-8", "surrogatepass"), digest_size=20).hexdigest()
+
+def load_cached_response(key: str) -> Optional[LLMResponse]:
+    """Load a cached response from disk, or None if it is missing or unreadable."""
+    cache_file = get_response_cache_dir() / f"{key}.json"
+    try:
+        response = LLMResponse.model_validate_json(cache_file.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable response cache entry {cache_file}: {e}")
+        return None
+    return response.model_copy(update={"metadata": {**response.metadata, "cache_hit": True}})
+
+def store_cached_response(key: str, response: LLMResponse) -> None:
+    """Write a response to the on-disk cache, replacing any previous entry atomically."""
+    cache_dir = get_response_cache_dir()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+        tmp_file.write_text(response.model_dump_json(), encoding="utf-8")
+        os.replace(tmp_file, cache_dir / f"{key}.json")
+    except OSError as e:
+        logger.warning(f"Failed to cache response {key}: {e}")
+
+@lru_cache(maxsize=None)
+def _redis_pool(host: str, port: int, password: Optional[str]) -> redis.ConnectionPool:
+    """Connection pool shared by every Redis probe against the same server."""
+    return redis.ConnectionPool(
+        host=host,
+        port=port,
+        password=password,
+        socket_timeout=2,
+        max_connections=REDIS_MAX_CONNECTIONS
+    )
+
+def initialize_litellm_cache() -> None:
+    """Initialize LiteLLM's built-in caching functionality."""
     try:
         logger.debug("Starting LiteLLM cache initialization...")
-        # Test Redis connection
-        test_redis = redis.Redis(
-            host="localhost", port=6379, password=None, socket_timeout=2
-        )
+
+        # Get Redis configuration from environment
+        redis_host = os.environ.get("REDIS_HOST", "localhost")
+        redis_port = int(os.environ.get("REDIS_PORT", "6379"))
+        redis_password = os.environ.get("REDIS_PASSWORD")
+
+        # One round-trip to check Redis is up; configuring the cache does the rest
+        test_redis = redis.Redis(connection_pool=_redis_pool(redis_host, redis_port, redis_password))
         if not test_redis.ping():
             raise ConnectionError("Redis is not responding.")
 
-        # Log existing keys
-        keys = test_redis.keys("*")
-        if keys:
-            logger.debug(f"Existing Redis keys: {keys}")
-
-        # Configure cache
         litellm.cache = litellm.Cache(
             type="redis",
-            host="localhost",
-            port=6379,
-            password=None,
+            host=redis_host,
+            port=redis_port,
+            password=redis_password,
             supported_call_types=["acompletion", "completion"],
-            ttl=60 * 60 * 24 * 2  # 2 days
+            ttl=60 * 60 * 24 * 2,  # 2 days
         )
         litellm.enable_cache()
+
+        # Set debug logging for LiteLLM
         os.environ["LITELLM_LOG"] = "DEBUG"
+        logger.info(f"✅ Redis caching enabled on {redis_host}:{redis_port}")
 
     except (redis.ConnectionError, redis.TimeoutError) as e:
-        logger.warning(f"Redis connection failed: {e}. Using in-memory cache.")
+        logger.warning(
+            f"⚠️ Redis connection failed: {e}. Falling back to in-memory caching."
+        )
+        # Fall back to in-memory caching if Redis is unavailable
+        logger.debug("Configuring in-memory cache fallback...")
         litellm.cache = litellm.Cache(type="local")
         litellm.enable_cache()
+        logger.debug("In-memory cache enabled")
 
 async def query_model(
     model: str = "openai/gpt-4o-mini",
@@ -47,10 +148,19 @@ async def query_model(
     system_prompt: Optional[str] = None,
     max_tokens: Optional[int] = None,
     stream: bool = False,
-    max_retries: int = 3
+    max_retries: int = 3,
+    session: Optional[httpx.AsyncClient] = None
 ) -> Union[LLMResponse, AsyncGenerator[str, None]]:
-    """Query LLM model with proper error handling and response typing."""
+    """Query LLM model with proper error handling and response typing.
+    
+    If ``session`` is given it is used for the request, so callers issuing many
+    queries can reuse one connection pool; otherwise a shared client is used.
+    """
     try:
+        if session is not None:
+            litellm.aclient_session = session
+        else:
+            configure_http_client()
         messages = [
             {"role": "system", "content": system_prompt or "You are a helpful AI assistant."},
             {"role": "user", "content": content}
@@ -98,9 +208,9 @@ async def query_model(
 def save_response(response: LLMResponse, path: str) -> None:
     """Save LLM response to file with proper validation."""
     try:
-        with open(path, "w") as f:
-            f.write(response.model_dump_json(indent=2))
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(response.model_dump(), option=orjson.OPT_INDENT_2))
         logger.debug(f"Response saved to {path}")
     except Exception as e:
         logger.error(f"Error saving response: {e}")
-        raise 
\ No newline at end of file
+        raise 
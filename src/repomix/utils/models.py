@@ -1,5 +1,6 @@
 """Models for repomix using Pydantic V2 patterns."""
 
+from dataclasses import dataclass
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, ConfigDict, Field
 import uuid
@@ -12,9 +13,15 @@ class Message(BaseModel):
     model_config = ConfigDict(frozen=True)
 
 
-class TokenUsage(BaseModel):
-    """Token usage statistics."""
-    model_config = ConfigDict(frozen=True)
+@dataclass(frozen=True)
+class TokenUsage:
+    """Token usage statistics.
+    
+    A plain slotted dataclass rather than a model: it is built once per LLM
+    call from integers the provider already returned, so field validation
+    buys nothing. Pydantic still validates it as a field of LLMResponse.
+    """
+    __slots__ = ("completion_tokens", "prompt_tokens", "total_tokens")
     
     completion_tokens: int
     prompt_tokens: int
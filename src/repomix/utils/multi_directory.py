@@ -1,13 +1,18 @@
 """Module for handling multi-directory analysis functionality."""
 from pathlib import Path
 from typing import List, Dict, Any
+import os
 import asyncio
+import hashlib
 from loguru import logger
 from repomix.utils.file_utils import collect_files
 from repomix.utils.parser import concatenate_files
 from repomix.utils.llm import query_model
 import litellm
 
+# Upper bound on directories walked and read at the same time by analyze_directories
+MAX_CONCURRENT_DIRECTORIES = min(32, (os.cpu_count() or 1) * 2)
+
 async def validate_directories(directories: List[str]) -> List[Path]:
     """Validate that all provided directories exist.
     
@@ -30,7 +35,11 @@ async def validate_directories(directories: List[str]) -> List[Path]:
         validated.append(path)
     return validated
 
-async def process_directory(directory: Path, repo_url: str = "", target_dir: str = "") -> Dict[str, Any]:
+async def process_directory(
+    directory: Path,
+    repo_url: str = "",
+    target_dir: str = ""
+) -> Dict[str, Any]:
     """Process a single directory and prepare its content for analysis.
     
     Args:
@@ -43,14 +52,15 @@ async def process_directory(directory: Path, repo_url: str = "", target_dir: str
     """
     logger.info(f"Processing directory: {directory}")
     
-    # Collect files from the directory
-    files = collect_files(directory)
+    # Walk and read in a worker thread so directories gathered together
+    # overlap their filesystem syscalls
+    files = await asyncio.get_running_loop().run_in_executor(None, collect_files, directory)
     if not files:
         logger.warning(f"No files found in directory: {directory}")
         return {"files": [], "content": ""}
     
     # Concatenate files with context
-    content = concatenate_files(files, directory, repo_url, target_dir)
+    content = await asyncio.get_running_loop().run_in_executor(None, concatenate_files, files, directory, repo_url, target_dir)
     
     return {
         "files": [str(f) for f in files],
@@ -79,13 +89,48 @@ async def combine_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
         "content": "\n\n".join(combined_content)
     }
 
+def _content_key(content: str) -> bytes:
+    """Digest of a directory's file sections, ignoring the metadata header."""
+    # The header carries a generation timestamp, so identical directories
+    # would otherwise never compare equal
+    _, sep, files = content.partition("\n\nFile: ")
+    return hashlib.blake2b((sep + files or content).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+async def _bounded(semaphore: asyncio.Semaphore, coro: Any) -> Any:
+    """Await ``coro`` once a slot in ``semaphore`` is free."""
+    async with semaphore:
+        return await coro
+
+async def _gather_or_cancel(coros: List[Any]) -> List[Any]:
+    """Run coroutines concurrently, cancelling the rest as soon as one fails.
+    
+    Unlike asyncio.gather, a failure (e.g. an invalid model) does not leave
+    the remaining LLM requests running to completion in the background. The
+    cancelled requests have finished unwinding by the time the error is raised.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            await next_done
+    except BaseException:
+        await cancel_and_wait(tasks)
+        raise
+    return [task.result() for task in tasks]
+
+async def cancel_and_wait(tasks: List["asyncio.Future[Any]"]) -> None:
+    """Cancel every task that is still running and wait until all have finished."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
 async def analyze_directories(
     directories: List[str],
     model: str,
     question: str,
     repo_url: str = "",
     target_dir: str = "",
-    combined_analysis: bool = False
+    combined_analysis: bool = False,
+    max_concurrent: int = MAX_CONCURRENT_DIRECTORIES
 ) -> Dict[str, Any]:
     """Analyze multiple directories concurrently.
     
@@ -96,12 +141,15 @@ async def analyze_directories(
         repo_url: Optional repository URL for context.
         target_dir: Optional target directory path for context.
         combined_analysis: Whether to analyze all directories together.
+        max_concurrent: Maximum number of directories processed at once, so
+            large fan-outs don't exhaust threads and file descriptors.
         
     Returns:
         Dictionary containing analysis results.
         
     Raises:
-        ValueError: If directories list is empty or contains invalid directories.
+        ValueError: If directories list is empty, contains invalid directories,
+            or max_concurrent is less than 1.
         litellm.NotFoundError: If the model is invalid.
         litellm.BadRequestError: If there's an issue with the model request.
     """
@@ -109,13 +157,16 @@ async def analyze_directories(
     if not directories:
         logger.error("No directories provided for analysis")
         raise ValueError("Directory list cannot be empty")
+    if max_concurrent < 1:
+        raise ValueError("max_concurrent must be at least 1")
         
     # Validate directories
     validated_dirs = await validate_directories(directories)
     logger.info(f"Validated directories: {[str(d) for d in validated_dirs]}")
     
     # Process each directory
-    tasks = [process_directory(d, repo_url, target_dir) for d in validated_dirs]
+    semaphore = asyncio.Semaphore(max_concurrent)
+    tasks = [_bounded(semaphore, process_directory(d, repo_url, target_dir)) for d in validated_dirs]
     results = await asyncio.gather(*tasks)
     
     if combined_analysis:
@@ -141,36 +192,47 @@ async def analyze_directories(
                 raise
             raise ValueError(f"Error with model {model}: {str(e)}")
     else:
-        # Analyze each directory separately
+        # Analyze each directory separately; directories with identical
+        # file contents share one request
         analysis_tasks = []
-        for result in results:
-            if result["content"]:
-                system_prompt = f"Analyze this directory and answer: {question}"
-                try:
-                    task = query_model(model, result["content"], system_prompt)
-                    analysis_tasks.append(task)
-                except Exception as e:
-                    logger.error(f"Error querying model {model} for directory analysis: {type(e).__name__}: {str(e)}")
-                    logger.debug(f"Analysis context: files={len(result['files'])}, content_length={len(result['content'])}")
-                    # Re-raise litellm exceptions directly
-                    if isinstance(e, litellm.exceptions.NotFoundError):
-                        logger.error(f"Invalid model: {model}")
-                        raise
-                    if isinstance(e, litellm.exceptions.BadRequestError):
-                        logger.error(f"Bad request to model {model}: {str(e)}")
-                        raise
-                    raise ValueError(f"Error with model {model}: {str(e)}")
-        
+        task_for_content: Dict[bytes, int] = {}
+        analyzed = [result for result in results if result["content"]]
+        task_indices = []
+        for result in analyzed:
+            key = _content_key(result["content"])
+            if key in task_for_content:
+                logger.debug(f"Reusing analysis for duplicate directory content: {len(result['files'])} files")
+                task_indices.append(task_for_content[key])
+                continue
+            task_for_content[key] = len(analysis_tasks)
+            task_indices.append(len(analysis_tasks))
+            system_prompt = f"Analyze this directory and answer: {question}"
+            try:
+                task = query_model(model, result["content"], system_prompt)
+                analysis_tasks.append(task)
+            except Exception as e:
+                logger.error(f"Error querying model {model} for directory analysis: {type(e).__name__}: {str(e)}")
+                logger.debug(f"Analysis context: files={len(result['files'])}, content_length={len(result['content'])}")
+                # Re-raise litellm exceptions directly
+                if isinstance(e, litellm.exceptions.NotFoundError):
+                    logger.error(f"Invalid model: {model}")
+                    raise
+                if isinstance(e, litellm.exceptions.BadRequestError):
+                    logger.error(f"Bad request to model {model}: {str(e)}")
+                    raise
+                raise ValueError(f"Error with model {model}: {str(e)}")
+    
         try:
-            analyses = await asyncio.gather(*analysis_tasks)
+            unique_analyses = await _gather_or_cancel(analysis_tasks)
+            analyses = [unique_analyses[i] for i in task_indices]
             return {
                 "directory_results": [
                     {
                         "files": result["files"],
                         "analysis": analysis
                     }
-                    for result, analysis in zip(results, analyses)
-                    if result["content"] and analysis is not None
+                    for result, analysis in zip(analyzed, analyses)
+                    if analysis is not None
                 ],
                 "is_combined": False
             }
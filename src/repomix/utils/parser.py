@@ -1,13 +1,17 @@
 """File parsing and concatenation utilities for repomix."""
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union, TextIO, Mapping, Optional, Sized
 from pathlib import Path
-import glob
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, lru_cache
+import io
+import os
 from datetime import datetime
-import tiktoken
 from loguru import logger
 import mimetypes
-from repomix.utils.spacy_utils import count_tokens
-from repomix.utils.file_utils import is_binary_file
+from repomix.utils.token_utils import get_cl100k_tokenizer, count_tokens_batch
+from repomix.utils.file_utils import (
+    is_binary_file, binary_by_extension, has_binary_mime_type, normalize_newlines, collect_files_iter, BINARY_SNIFF_SIZE
+)
 
 
 def glob_files(
@@ -34,40 +38,51 @@ def glob_files(
             return []
         raise ValueError(f"Target directory not found: {target_path}")
         
-    files = []
-    for file in target_path.rglob('*'):
-        if not file.is_file():
-            continue
-            
-        # Skip ignored files
-        if any(file.match(pattern) for pattern in ignore_patterns):
-            continue
-            
-        # Skip binary files
-        if is_binary_file(file):
-            continue
-            
-        files.append(file)
-                
-    return files
+    # Scan with os.scandir, pruning ignored directories before descending.
+    # Only files whose extension doesn't settle it are opened and sniffed;
+    # concatenate_files still skips any known-text file that contains NULs.
+    return [
+        Path(entry.path) for entry in collect_files_iter(target_path, ignore_patterns)
+        if not _is_binary(entry)
+    ]
+
+
+def _is_binary(entry: os.DirEntry) -> bool:
+    """Check a file by extension, falling back to the content sniff for unknown ones."""
+    known = binary_by_extension(entry.path)
+    if known is not None:
+        return known
+    # Key the sniff on size and mtime so repeated globs of an unchanged tree
+    # don't re-read it, while an edited file is sniffed again
+    stat = entry.stat()
+    return _sniff_binary(entry.path, stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=16384)
+def _sniff_binary(path: str, size: int, mtime_ns: int) -> bool:
+    """Content sniff of a file whose extension is inconclusive, per file version."""
+    return is_binary_file(Path(path))
 
 
 def count_tokens(text: str) -> int:
     """
     Count tokens in text using tiktoken.
     
+    Called once per line while chunking, so it uses the process-wide cached
+    tokenizer (rs-bpe when installed) and skips the digest memo that
+    token_utils.count_tokens keeps for whole documents.
+    
     Args:
         text: Input text
         
     Returns:
         Number of tokens
     """
-    encoder = tiktoken.get_encoding("cl100k_base")
-    return len(encoder.encode(text))
+    return get_cl100k_tokenizer().count(text)
 
 
 def generate_metadata(
-    files: List[Path],
+    files: Sized,
     total_tokens: int,
     repo_url: str,
     target_dir: str
@@ -76,7 +91,7 @@ def generate_metadata(
     Generate metadata for concatenated file.
     
     Args:
-        files: List of processed files
+        files: Processed files (only their number is used)
         total_tokens: Total token count
         repo_url: Repository URL
         target_dir: Target directory
@@ -111,46 +126,69 @@ def concatenate_files(
     Returns:
         Concatenated file content with metadata
     """
+    result = io.StringIO()
+    concatenate_files_to(result, files, base_path, repository_url, target_dir)
+    return result.getvalue()
+
+
+def concatenate_files_to(
+    writer: TextIO,
+    files: List[Path],
+    base_path: Path,
+    repository_url: str,
+    target_dir: str
+) -> None:
+    """
+    Write the output of concatenate_files to ``writer`` one file at a time.
+    
+    Only one file's content is held in memory, so large repositories can be
+    streamed straight to disk. Each file is opened only once.
+    
+    Args:
+        writer: Text stream to write to, e.g. a file opened with "w"
+        files: List of files to concatenate
+        base_path: Base repository path
+        repository_url: URL of the repository
+        target_dir: Target directory within repository
+    """
     if not files:
-        return ""
-        
-    # Build metadata section
-    metadata = {
-        "total_tokens": 0,  # Will be updated by LLM
-        "file_count": len(files),
-        "repository": repository_url,
-        "target_directory": target_dir,
-        "generated": datetime.now().isoformat()
-    }
+        return
     
-    # Build metadata section
-    result = ["# Metadata"]
-    for key, value in metadata.items():
-        result.append(f"{key}: {value}")
+    writer.write(_metadata_header(files, repository_url, target_dir))
     
-    # Add files with proper separation
     for file in files:
-        # Skip binary files
-        if is_binary_file(file):
-            logger.debug(f"Skipping binary file: {file}")
+        # Skip binary files, reading each remaining file only once
+        if has_binary_mime_type(file):
+            logger.debug("Skipping binary file: {}", file)
             continue
-            
         try:
-            relative_path = str(file.relative_to(base_path))
-            content = file.read_text()  # Preserve exact file content
-            
-            # Add empty line before file section (except first file)
-            if len(result) > 0:
-                result.append("")
-                
-            # Add file header and content
-            result.append(f"File: {relative_path}")
-            result.append(content)
+            data = file.read_bytes()
+        except OSError as e:
+            logger.debug("Skipping unreadable file {}: {}", file, e)
+            continue
+        if data.find(b"\0", 0, BINARY_SNIFF_SIZE) != -1:
+            logger.debug("Skipping binary file: {}", file)
+            continue
+        try:
+            # Only non-ASCII content needs a validating decode
+            content = data.decode("ascii" if data.isascii() else "utf-8")
         except UnicodeDecodeError:
-            logger.debug(f"Skipping file with encoding issues: {file}")
+            logger.debug("Skipping file with encoding issues: {}", file)
             continue
-    
-    return "\n".join(result)
+        # Normalized per file, as reading each one in text mode would
+        content = normalize_newlines(content)
+        
+        # Add empty line before file section, then header and content
+        relative_path = str(file.relative_to(base_path))
+        writer.write(f"\n\nFile: {relative_path}\n")
+        writer.write(content)
+
+
+def _metadata_header(files: Sized, repository_url: str, target_dir: str) -> str:
+    """Build the metadata section that heads concatenated output."""
+    # total_tokens is filled in later by the LLM step
+    metadata = generate_metadata(files, 0, repository_url, target_dir)
+    return "# Metadata" + "".join(f"\n{key}: {value}" for key, value in metadata.items())
 
 
 def format_file_section(filepath: str, content: str) -> str:
@@ -158,53 +196,162 @@ def format_file_section(filepath: str, content: str) -> str:
     return f"File: {filepath}\n{content}"
 
 
-def split_long_line(line: str, filename: str, part_number: int, token_limit: int) -> List[str]:
-    """Split a long line into multiple chunks that fit within token limit."""
-    print(f"DEBUG: split_long_line called with line length {len(line)}, token_limit {token_limit}")
+def split_long_line(
+    line: str,
+    filename: str,
+    part_number: int,
+    token_limit: int,
+    header_tokens: Optional[Mapping[int, int]] = None
+) -> List[str]:
+    """Split a long line into multiple chunks that fit within token limit.
+    
+    The line is encoded once and cut on token boundaries, rather than
+    re-encoding ever-shorter prefixes to search for each cut. ``header_tokens``
+    maps part numbers to their header's token count; pass the file's memo to
+    share it across calls.
+    """
+    if header_tokens is None:
+        header_tokens = _PartHeaderTokens(filename)
+    tokenizer = get_cl100k_tokenizer()
+    tokens = tokenizer.encode(line)
     line_chunks: List[str] = []
-    remaining = line
+    start = 0
     
-    while remaining:
+    while start < len(tokens):
         prefix = f"{part_number:03d}"
-        header = format_file_section(f"{prefix}_{filename}", "")
-        available_tokens = token_limit - count_tokens(header)
-        print(f"DEBUG: Available tokens after header: {available_tokens}")
+        available_tokens = token_limit - header_tokens[part_number]
         
-        # Take as much of the line as possible while staying under the token limit
-        current_part = remaining
-        while count_tokens(current_part) > available_tokens:
-            # Binary search to find the largest substring that fits
-            left, right = 0, len(current_part)
-            while left < right - 1:
-                mid = (left + right) // 2
-                if count_tokens(current_part[:mid]) <= available_tokens:
-                    left = mid
-                else:
-                    right = mid
-            current_part = current_part[:left]
-            print(f"DEBUG: Binary search found part length {len(current_part)}")
-            
-            # Ensure we make progress
-            if not current_part:
-                current_part = remaining[:max(1, len(remaining) // 2)]
-                print(f"DEBUG: Empty part, forcing progress with length {len(current_part)}")
+        # Take as many tokens as fit, backing off if the cut lands inside a
+        # multi-byte character
+        limit = min(len(tokens), start + max(1, available_tokens))
+        current_part = None
+        for end in range(limit, start, -1):
+            current_part = tokenizer.decode(tokens[start:end])
+            if current_part is not None:
                 break
+        if current_part is None:
+            # No prefix decodes on its own; extend to the next character boundary
+            for end in range(limit + 1, len(tokens) + 1):
+                current_part = tokenizer.decode(tokens[start:end])
+                if current_part is not None:
+                    break
         
         chunk = format_file_section(f"{prefix}_{filename}", current_part)
-        print(f"DEBUG: Created chunk with {count_tokens(chunk)} tokens")
         line_chunks.append(chunk)
-        remaining = remaining[len(current_part):]
+        start = end
         part_number += 1
-        print(f"DEBUG: Remaining length: {len(remaining)}")
-        
-        # Safety check to prevent infinite loops
-        if len(remaining) == len(line):
-            print("DEBUG: No progress made, forcing advancement")
-            remaining = remaining[1:]  # Force progress
     
     return line_chunks
 
 
+# Threads used to tokenize files while chunking
+CHUNK_WORKERS = os.cpu_count() or 1
+
+# Characters before a join that can share a pre-token with the separator
+JOIN_BOUNDARY_CONTEXT = 256
+
+# Joins estimated this close to the limit are counted exactly
+JOIN_ESTIMATE_SLACK = 4
+
+
+class _PartHeaderTokens(dict):
+    """Token counts of a file's numbered part headers, computed once per part number.
+    
+    The count is not constant: it grows once part numbers reach four digits.
+    """
+    
+    def __init__(self, filename: str) -> None:
+        super().__init__()
+        self.filename = filename
+    
+    def __missing__(self, part_number: int) -> int:
+        tokens = self[part_number] = count_tokens(format_file_section(f"{part_number:03d}_{self.filename}", ""))
+        return tokens
+
+
+def _join_boundary_tokens(text: str) -> int:
+    """Tokens added by appending a blank-line separator and a new section to ``text``.
+    
+    A section starts with "File:" right after the newlines, so it tokenizes the
+    same wherever it is placed; only ``text``'s trailing pre-token can merge
+    with the separator, and a short tail captures it.
+    """
+    tail = text[-JOIN_BOUNDARY_CONTEXT:]
+    if len(tail) < len(text) and not tail.strip():
+        # Whitespace run longer than the window: count the whole join
+        return count_tokens(text + "\n\n") - count_tokens(text)
+    return count_tokens(tail + "\n\n") - count_tokens(tail)
+
+
+@lru_cache(maxsize=1)
+def _separator_tokens() -> int:
+    """Token count of the blank line placed between packed sections."""
+    return count_tokens("\n\n")
+
+
+def _chunk_one_file(filename: str, content: str, token_limit: int) -> Union[Tuple[str, int], List[str]]:
+    """Chunk a single file independently of the others.
+    
+    Returns the whole section and its token count when the file fits within
+    the limit, so it can be packed with its neighbours; otherwise returns the
+    file's numbered parts, each of which becomes its own chunk.
+    """
+    parts: List[str] = []
+    lines = content.split("\n")
+    # Count each line once; the packing loops below reuse these
+    line_token_counts = count_tokens_batch(lines)
+    part_header_tokens = _PartHeaderTokens(filename)
+    
+    # Try to add the whole file as one chunk. A line too long for a part
+    # would also push the whole section over the limit, so lines are only
+    # checked individually, in the single pass below, once this fails.
+    full_section = format_file_section(filename, content)
+    section_tokens = count_tokens(full_section)
+    if section_tokens <= token_limit:
+        return full_section, section_tokens
+    
+    # Split the file line by line into parts, splitting long lines as they come
+    part_number = 1
+    part_lines: List[str] = []
+    current_part_tokens = 0
+    
+    for line, line_tokens in zip(lines, line_token_counts):
+        header_tokens = part_header_tokens[part_number]
+        
+        if line_tokens > (token_limit - header_tokens):
+            # Flush any accumulated lines before handling the long line
+            if part_lines:
+                parts.append(format_file_section(f"{part_number:03d}_{filename}", "\n".join(part_lines)))
+                part_number += 1
+                part_lines = []
+                current_part_tokens = 0
+            
+            # Split the long line
+            line_chunks = split_long_line(line, filename, part_number, token_limit, part_header_tokens)
+            logger.debug("Split a {}-token line of {} into {} parts", line_tokens, filename, len(line_chunks))
+            parts.extend(line_chunks)
+            part_number += len(line_chunks)
+        elif current_part_tokens + line_tokens + header_tokens <= token_limit:
+            # Add line to current part
+            part_lines.append(line)
+            current_part_tokens += line_tokens
+        elif part_lines:
+            # Current part is full, flush it
+            parts.append(format_file_section(f"{part_number:03d}_{filename}", "\n".join(part_lines)))
+            part_number += 1
+            part_lines = [line]
+            current_part_tokens = line_tokens
+        else:
+            # Single line becomes its own part
+            parts.append(format_file_section(f"{part_number:03d}_{filename}", line))
+            part_number += 1
+    
+    # Flush any remaining lines
+    if part_lines:
+        parts.append(format_file_section(f"{part_number:03d}_{filename}", "\n".join(part_lines)))
+    return parts
+
+
 def chunk_content(content_by_file: Dict[str, str], token_limit: int = 4000) -> List[str]:
     """
     Splits repository text into chunks within the token limit.
@@ -213,6 +360,9 @@ def chunk_content(content_by_file: Dict[str, str], token_limit: int = 4000) -> L
       - If any line in the file exceeds the token limit, that line is split first
       - If the file (header + content) fits within the token limit, it is added as a whole
       - Otherwise, the file is split line by line into parts
+    
+    Files are tokenized in parallel threads (the encoders release the GIL),
+    then packed together serially in sorted order.
     """
     chunks: List[str] = []
     current_chunk = ""
@@ -226,128 +376,42 @@ def chunk_content(content_by_file: Dict[str, str], token_limit: int = 4000) -> L
             current_chunk_tokens = 0
     
     # Process files in sorted order for deterministic output
-    for filename in sorted(content_by_file.keys()):
-        content = content_by_file[filename]
-        lines = content.split("\n")
-        
-        # First check if any individual line exceeds the token limit
-        has_long_lines = False
-        for line in lines:
-            header = format_file_section(filename, "")
-            line_tokens = count_tokens(line)
-            header_tokens = count_tokens(header)
-            print(f"DEBUG: Line length: {len(line)} chars, {line_tokens} tokens")
-            print(f"DEBUG: Header length: {len(header)} chars, {header_tokens} tokens")
-            if line_tokens > (token_limit - header_tokens):
-                has_long_lines = True
-                print(f"DEBUG: Found long line: {line_tokens} tokens > {token_limit - header_tokens} available tokens")
-                break
+    filenames = sorted(content_by_file.keys())
+    chunk_file = partial(_chunk_one_file, token_limit=token_limit)
+    contents = [content_by_file[filename] for filename in filenames]
+    if len(filenames) > 1 and CHUNK_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(filenames))) as executor:
+            results = list(executor.map(chunk_file, filenames, contents))
+    else:
+        results = list(map(chunk_file, filenames, contents))
+    
+    for result in results:
+        if isinstance(result, list):
+            # Parts of an oversized file each stand alone
+            flush_current_chunk()
+            chunks.extend(result)
+            continue
         
-        if has_long_lines:
-            print("DEBUG: Processing file with long lines")
-            # Process the file line by line since we know some lines need splitting
-            part_number = 1
-            part_lines: List[str] = []
-            current_part_tokens = 0
-            
-            for line in lines:
-                header = format_file_section(f"{part_number:03d}_{filename}", "")
-                header_tokens = count_tokens(header)
-                line_tokens = count_tokens(line)
-                
-                if line_tokens > (token_limit - header_tokens):
-                    print(f"DEBUG: Splitting line with {line_tokens} tokens")
-                    # Flush any accumulated lines before handling the long line
-                    if part_lines:
-                        part_content = "\n".join(part_lines)
-                        flush_current_chunk()
-                        chunks.append(format_file_section(f"{part_number:03d}_{filename}", part_content))
-                        part_number += 1
-                        part_lines = []
-                        current_part_tokens = 0
-                    
-                    # Split the long line
-                    line_chunks = split_long_line(line, filename, part_number, token_limit)
-                    print(f"DEBUG: Split into {len(line_chunks)} chunks")
-                    chunks.extend(line_chunks)
-                    part_number += len(line_chunks)
-                else:
-                    # Try to add line to current part
-                    if current_part_tokens + line_tokens + header_tokens <= token_limit:
-                        part_lines.append(line)
-                        current_part_tokens += line_tokens
-                    else:
-                        # Current part is full, flush it
-                        if part_lines:
-                            part_content = "\n".join(part_lines)
-                            flush_current_chunk()
-                            chunks.append(format_file_section(f"{part_number:03d}_{filename}", part_content))
-                            part_number += 1
-                            part_lines = [line]
-                            current_part_tokens = line_tokens
-                        else:
-                            # Single line becomes its own part
-                            flush_current_chunk()
-                            chunks.append(format_file_section(f"{part_number:03d}_{filename}", line))
-                            part_number += 1
-            
-            # Flush any remaining lines
-            if part_lines:
-                part_content = "\n".join(part_lines)
-                flush_current_chunk()
-                chunks.append(format_file_section(f"{part_number:03d}_{filename}", part_content))
-        else:
-            # Try to add the whole file as one chunk
-            full_section = format_file_section(filename, content)
-            section_tokens = count_tokens(full_section)
-            
-            if section_tokens <= token_limit:
-                # Try to append to current chunk if possible
-                if current_chunk:
-                    candidate = current_chunk + "\n\n" + full_section
-                    candidate_tokens = count_tokens(candidate)
-                    if candidate_tokens <= token_limit:
-                        current_chunk = candidate
-                        current_chunk_tokens = candidate_tokens
-                        continue
-                    else:
-                        flush_current_chunk()
-                current_chunk = full_section
-                current_chunk_tokens = section_tokens
-            else:
-                # Split by lines (but we know no individual line exceeds the limit)
-                part_number = 1
-                part_lines = []
-                current_part_tokens = 0
-                
-                for line in lines:
-                    header = format_file_section(f"{part_number:03d}_{filename}", "")
-                    header_tokens = count_tokens(header)
-                    line_tokens = count_tokens(line)
-                    
-                    if current_part_tokens + line_tokens + header_tokens <= token_limit:
-                        part_lines.append(line)
-                        current_part_tokens += line_tokens
-                    else:
-                        # Flush current part
-                        if part_lines:
-                            part_content = "\n".join(part_lines)
-                            flush_current_chunk()
-                            chunks.append(format_file_section(f"{part_number:03d}_{filename}", part_content))
-                            part_number += 1
-                            part_lines = [line]
-                            current_part_tokens = line_tokens
-                        else:
-                            # Single line becomes its own part
-                            flush_current_chunk()
-                            chunks.append(format_file_section(f"{part_number:03d}_{filename}", line))
-                            part_number += 1
-                
-                # Flush any remaining lines
-                if part_lines:
-                    part_content = "\n".join(part_lines)
-                    flush_current_chunk()
-                    chunks.append(format_file_section(f"{part_number:03d}_{filename}", part_content))
+        full_section, section_tokens = result
+        # Try to append to current chunk if possible
+        if current_chunk:
+            # Merges across the separator only save tokens, so the plain sum
+            # is an upper bound; only near the limit is the boundary counted
+            # instead, which still avoids re-encoding the whole chunk
+            candidate_tokens = current_chunk_tokens + _separator_tokens() + section_tokens
+            if candidate_tokens > token_limit - JOIN_ESTIMATE_SLACK:
+                candidate_tokens = (
+                    current_chunk_tokens
+                    + _join_boundary_tokens(current_chunk)
+                    + section_tokens
+                )
+            if candidate_tokens <= token_limit:
+                current_chunk = current_chunk + "\n\n" + full_section
+                current_chunk_tokens = candidate_tokens
+                continue
+            flush_current_chunk()
+        current_chunk = full_section
+        current_chunk_tokens = section_tokens
     
     flush_current_chunk()
-    return chunks 
\ No newline at end of file
+    return chunks
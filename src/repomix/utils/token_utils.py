@@ -0,0 +1,169 @@
+import tiktoken
+from loguru import logger
+from functools import lru_cache
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import Callable, List, Optional, Tuple
+
+try:
+    from rs_bpe.bpe import openai as rs_bpe_openai
+except ImportError:  # Optional: tiktoken is used instead
+    rs_bpe_openai = None
+
+# Encoding used when no model is given or the model is unknown to tiktoken
+DEFAULT_ENCODING = "cl100k_base"
+
+# Bounded memo of token counts keyed by content digest
+TOKEN_COUNT_CACHE_SIZE = 1024
+_token_count_cache: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+# count_tokens runs on reader and chunking threads; reordering is not atomic
+_token_count_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: Optional[str] = None) -> tiktoken.Encoding:
+    """Get cached tiktoken encoding for a model, falling back to cl100k_base."""
+    if model:
+        try:
+            # Strip provider prefix, e.g. "openai/gpt-4o-mini"
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            logger.debug(f"No tiktoken encoding for model {model}, using {DEFAULT_ENCODING}")
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+class Cl100kTokenizer:
+    """cl100k_base encode/count/decode, backed by rs-bpe when installed and tiktoken otherwise.
+    
+    rs-bpe counts in linear time without materializing token ids, which is
+    what chunking needs; both backends produce identical tokens.
+    """
+    encode: Callable[[str], List[int]]
+    count: Callable[[str], int]
+    
+    def __init__(self) -> None:
+        if rs_bpe_openai is not None:
+            tokenizer = rs_bpe_openai.cl100k_base()
+            self.backend = "rs-bpe"
+            self.encode = tokenizer.encode
+            self.count = tokenizer.count
+            self._decode = tokenizer.decode
+        else:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            self.backend = "tiktoken"
+            self.encode = encoding.encode_ordinary
+            self.count = lambda text: len(encoding.encode_ordinary(text))
+            self._decode = lambda tokens: _decode_utf8(encoding.decode_bytes(tokens))
+    
+    def decode(self, tokens: List[int]) -> Optional[str]:
+        """Decode tokens, or None if they end partway through a character."""
+        return self._decode(tokens)
+
+
+def _decode_utf8(data: bytes) -> Optional[str]:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_cl100k_tokenizer() -> Cl100kTokenizer:
+    """Get the cached cl100k_base tokenizer."""
+    return Cl100kTokenizer()
+
+
+def split_text_into_chunks(text: str, chunk_size: int = 900000) -> List[str]:
+    """Split text into chunks of at most chunk_size characters, breaking on lines where possible."""
+    # If text is under chunk_size, return as is
+    if len(text) <= chunk_size:
+        return [text]
+    
+    chunks = []
+    current_chunk = []
+    current_size = 0
+    
+    # Split by lines to avoid breaking in the middle of a line
+    lines = text.split("\n")
+    
+    for line in lines:
+        line_size = len(line) + 1  # +1 for the newline
+        
+        if current_size + line_size > chunk_size:
+            # If current chunk has content, save it
+            if current_chunk:
+                chunks.append("\n".join(current_chunk))
+                current_chunk = []
+                current_size = 0
+            
+            # If single line is bigger than chunk_size, split it
+            if line_size > chunk_size:
+                # Split the line into smaller pieces
+                chunks.extend(line[i:i + chunk_size] for i in range(0, len(line), chunk_size))
+                continue
+        
+        current_chunk.append(line)
+        current_size += line_size
+    
+    # Add the last chunk if there's anything left
+    if current_chunk:
+        chunks.append("\n".join(current_chunk))
+    
+    return chunks
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count BPE tokens in text.
+    
+    cl100k_base counts go through the shared tokenizer, so rs-bpe is used
+    when installed. Results are memoized by content digest so re-tokenizing
+    the same content is free.
+    """
+    encoding = get_encoding(model)
+    key = (encoding.name, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+    with _token_count_lock:
+        cached = _token_count_cache.get(key)
+        if cached is not None:
+            _token_count_cache.move_to_end(key)
+            return cached
+    
+    # Tokenize outside the lock so threads counting different texts don't wait
+    if encoding.name == DEFAULT_ENCODING:
+        token_count = get_cl100k_tokenizer().count(text)
+    else:
+        token_count = len(encoding.encode_ordinary(text))
+    with _token_count_lock:
+        _token_count_cache[key] = token_count
+        if len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+            _token_count_cache.popitem(last=False)
+    return token_count
+
+
+def count_tokens_batch(texts: List[str], model: Optional[str] = None) -> List[int]:
+    """Count BPE tokens in each of several texts in one call.
+    
+    Skips the per-text digest memo of count_tokens. cl100k_base counts go
+    through the shared tokenizer, so rs-bpe is used when installed.
+    """
+    encoding = get_encoding(model)
+    if encoding.name == DEFAULT_ENCODING:
+        return list(map(get_cl100k_tokenizer().count, texts))
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def truncate_text_by_tokens(text: str, max_tokens: int = 50, model: Optional[str] = None) -> str:
+    """Truncate text to max_tokens while preserving meaning."""
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    
+    if len(tokens) <= max_tokens:
+        return text
+        
+    # Get first and last n/2 tokens
+    half_tokens = max_tokens // 2
+    start_tokens = tokens[:half_tokens]
+    end_tokens = tokens[-half_tokens:] if half_tokens else []
+    
+    # Reconstruct text with ellipsis
+    return encoding.decode(start_tokens) + "... " + encoding.decode(end_tokens)
@@ -1,6 +1,7 @@
 """Configure pytest for repomix tests."""
 import pytest
 import os
+import subprocess
 import tempfile
 from pathlib import Path
 from loguru import logger
@@ -24,16 +25,15 @@ warnings.filterwarnings(
 # Configure test logging
 LOG_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | <level>{message}</level> | {extra}"
 
-@pytest.fixture(autouse=True)
-def setup_logging(request):
-    """Configure logging for tests with file and console output."""
+@pytest.fixture(scope="session", autouse=True)
+def log_file(request):
+    """Install the log sinks once per session (one file per xdist worker)."""
     # Create logs directory if it doesn't exist
     logs_dir = Path("tests/logs")
     logs_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create a log file named after the test
-    test_name = request.node.name.replace("[", "_").replace("]", "_")
-    log_file = logs_dir / f"{test_name}.log"
+    # Same id as xdist's worker_id fixture, which is missing when xdist isn't loaded
+    worker_id = getattr(request.config, "workerinput", {}).get("workerid", "master")
+    log_file = logs_dir / f"{worker_id}.log"
     
     # Remove existing handlers
     logger.remove()
@@ -44,28 +44,63 @@ def setup_logging(request):
         format=LOG_FORMAT,
         level="DEBUG",
         rotation="1 MB",
-        retention="3 days",
-        enqueue=True
+        retention="3 days"
     )
     logger.add(
         sys.stderr,
         format=LOG_FORMAT,
-        level="INFO",
-        enqueue=True
+        level="INFO"
     )
     
-    # Add test context
-    logger.configure(
-        extra={
-            "test_name": test_name,
-            "test_path": str(request.path)
-        }
-    )
-    
-    yield
+    yield log_file
     
-    # Clean up
     logger.info(f"Test logs saved to: {log_file}")
+    logger.remove()
+
+@pytest.fixture(autouse=True)
+def setup_logging(request, log_file):
+    """Tag every record emitted during a test with the test's name and path."""
+    test_name = request.node.name.replace("[", "_").replace("]", "_")
+    with logger.contextualize(test_name=test_name, test_path=str(request.path)):
+        yield
+
+@pytest.fixture(autouse=True)
+def isolated_response_cache(tmp_path, monkeypatch):
+    """Keep cached LLM responses out of the user's cache directory."""
+    monkeypatch.setenv("REPOMIX_CACHE_DIR", str(tmp_path / "cache"))
+
+# Repository shared by the tests that work on a real GitHub checkout
+RAYCAST_REPO_URL = "https://github.com/raycast/script-commands"
+RAYCAST_BRANCH = "master"
+
+# Bare mirrors kept between runs so the network is only hit once
+REPO_CACHE_DIR = Path(__file__).parent / ".cache"
+
+@pytest.fixture(scope="session")
+def raycast_repo(tmp_path_factory):
+    """Check out raycast/script-commands from a local mirror, cloning the mirror on first use."""
+    mirror = REPO_CACHE_DIR / "raycast-script-commands.git"
+    if not mirror.exists():
+        REPO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Blobless: file contents are fetched on first checkout, then kept
+        subprocess.run(
+            ["git", "-c", "protocol.version=2", "clone", "--bare", "--filter=blob:none",
+             "--depth=1", "--branch", RAYCAST_BRANCH, RAYCAST_REPO_URL, str(mirror)],
+            check=True, capture_output=True
+        )
+    
+    worktree = tmp_path_factory.mktemp("raycast") / "script-commands"
+    # Forget worktrees left registered by interrupted runs
+    subprocess.run(["git", "-C", str(mirror), "worktree", "prune"], check=True, capture_output=True)
+    subprocess.run(
+        ["git", "-C", str(mirror), "worktree", "add", "--detach", str(worktree), RAYCAST_BRANCH],
+        check=True, capture_output=True
+    )
+    yield worktree
+    subprocess.run(
+        ["git", "-C", str(mirror), "worktree", "remove", "--force", str(worktree)],
+        capture_output=True
+    )
 
 @pytest.fixture
 def temp_dir():
@@ -100,9 +135,25 @@ def mock_redis(mocker):
     mock.return_value.info.return_value = {"used_memory_human": "1M"}
     return mock
 
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(items):
+    """Keep every test using the shared raycast mirror on one xdist worker.
+    
+    Session fixtures are set up once per worker, so without the group two
+    workers could clone into the same mirror directory at once. Runs before
+    xdist reads the xdist_group marks.
+    """
+    for item in items:
+        if "raycast_repo" in getattr(item, "fixturenames", ()):
+            item.add_marker(pytest.mark.xdist_group("raycast-mirror"))
+
 def pytest_configure(config):
     """Configure pytest."""
     config.addinivalue_line(
         "markers",
         "asyncio: mark test as async"
+    )
+    config.addinivalue_line(
+        "markers",
+        "slow: end-to-end test left for nightly runs (deselected by default; run with -m slow)"
     ) 
\ No newline at end of file
@@ -1,45 +1,98 @@
 """Test for file concatenation functionality."""
+import io
 import pytest
-from pathlib import Path
-from repomix.utils.parser import concatenate_files
+from repomix.utils.parser import concatenate_files, concatenate_files_to
 
-def test_file_concatenation_format():
+def test_file_concatenation_format(tmp_path):
     """Test file concatenation format requirements."""
-    # Create test files
-    test_dir = Path("tests/temp")
-    test_dir.mkdir(parents=True, exist_ok=True)
-    
     # Create test files
     files = []
     for i in range(3):
-        file_path = test_dir / f"test{i}.txt"
+        file_path = tmp_path / f"test{i}.txt"
         file_path.write_text(f"Test content {i}\n")
         files.append(file_path)
     
-    try:
-        # Concatenate files
-        content = concatenate_files(files, test_dir, "https://github.com/test/repo", "/test/dir")
-        
-        # Split content into sections
-        sections = [s.strip() for s in content.split('\n\n') if s.strip()]
-        
-        # First section should be metadata
-        assert sections[0].startswith('# Metadata'), "First section should be metadata"
-        metadata_lines = sections[0].split('\n')
-        assert len(metadata_lines) >= 5, "Metadata should have at least 5 lines"
-        assert 'total_tokens:' in metadata_lines[1]
-        assert 'file_count:' in metadata_lines[2]
-        assert 'repository:' in metadata_lines[3]
-        assert 'target_directory:' in metadata_lines[4]
-        assert 'generated:' in metadata_lines[5]
-        
-        # Remaining sections should be files
-        for section in sections[1:]:
-            lines = section.split('\n')
-            assert lines[0].startswith('File:'), f"File section should start with 'File:', got: {lines[0]}"
-            assert len(lines) > 1, "File section should have content"
-    finally:
-        # Cleanup test files
-        for file in files:
-            file.unlink(missing_ok=True)
-        test_dir.rmdir() 
\ No newline at end of file
+    # Concatenate files
+    content = concatenate_files(files, tmp_path, "https://github.com/test/repo", "/test/dir")
+    
+    # Split content into sections
+    sections = [s.strip() for s in content.split('\n\n') if s.strip()]
+    
+    # First section should be metadata
+    assert sections[0].startswith('# Metadata'), "First section should be metadata"
+    metadata_lines = sections[0].split('\n')
+    assert len(metadata_lines) >= 5, "Metadata should have at least 5 lines"
+    assert 'total_tokens:' in metadata_lines[1]
+    assert 'file_count:' in metadata_lines[2]
+    assert 'repository:' in metadata_lines[3]
+    assert 'target_directory:' in metadata_lines[4]
+    assert 'generated:' in metadata_lines[5]
+    
+    # Remaining sections should be files
+    for section in sections[1:]:
+        lines = section.split('\n')
+        assert lines[0].startswith('File:'), f"File section should start with 'File:', got: {lines[0]}"
+        assert len(lines) > 1, "File section should have content"
+
+def test_file_concatenation_skips_binary_and_undecodable_files(tmp_path):
+    """Test binary and non-UTF-8 files are skipped and line endings are normalized."""
+    (tmp_path / "unix.txt").write_bytes("café\n".encode("utf-8"))
+    (tmp_path / "windows.txt").write_bytes(b"line one\r\nline two\r\n")
+    (tmp_path / "latin1.txt").write_bytes("café\n".encode("latin-1"))
+    (tmp_path / "data.bin").write_bytes(b"abc\0def")
+    (tmp_path / "image.png").write_bytes(b"not really a png")
+    files = sorted(tmp_path.iterdir())
+
+    content = concatenate_files(files, tmp_path, "https://github.com/test/repo", "")
+
+    assert "File: unix.txt\ncafé\n" in content
+    assert "File: windows.txt\nline one\nline two\n" in content
+    for skipped in ("latin1.txt", "data.bin", "image.png"):
+        assert f"File: {skipped}" not in content
+
+def test_file_concatenation_normalizes_line_endings_per_file(tmp_path):
+    """Test a CR ending one file stays in that file rather than joining the next separator."""
+    (tmp_path / "a.txt").write_bytes(b"a\r")
+    (tmp_path / "b.txt").write_bytes(b"b\r\nc")
+    files = sorted(tmp_path.iterdir())
+
+    content = concatenate_files(files, tmp_path, "https://github.com/test/repo", "")
+
+    expected = "".join(f"\n\nFile: {f.name}\n{f.read_text()}" for f in files)
+    assert content.endswith(expected)
+    assert "File: a.txt\na\n\n\nFile: b.txt\nb\nc" in content
+
+def test_concatenate_files_to_matches_concatenate_files(tmp_path):
+    """Test streamed output equals the in-memory result, including CRs at file boundaries."""
+    (tmp_path / "a.txt").write_bytes(b"ends with cr\r")
+    (tmp_path / "b.txt").write_bytes(b"crlf\r\nline\r\r")
+    (tmp_path / "c.bin").write_bytes(b"\0")
+    (tmp_path / "d.txt").write_bytes(b"last\r")
+    files = sorted(tmp_path.iterdir())
+
+    writer = io.StringIO()
+    concatenate_files_to(writer, files, tmp_path, "https://github.com/test/repo", "")
+    streamed = writer.getvalue()
+    content = concatenate_files(files, tmp_path, "https://github.com/test/repo", "")
+
+    strip_generated = lambda text: [line for line in text.split("\n") if not line.startswith("generated:")]
+    assert strip_generated(streamed) == strip_generated(content)
+    assert "\r" not in streamed
+    assert streamed.endswith("File: d.txt\nlast\n")
+    assert "File: a.txt\nends with cr\n\n\nFile: b.txt\ncrlf\nline\n\n\n\nFile: d.txt" in streamed
+
+def test_concatenate_files_to_normalizes_line_endings_per_file(tmp_path):
+    """Test a file ending in CR followed by a CRLF file streams as if each were read in text mode."""
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "a.txt").write_bytes(b"first\r")
+    (source / "b.txt").write_bytes(b"second\r\nthird\r\n")
+    files = sorted(source.iterdir())
+
+    output = tmp_path / "out.txt"
+    with open(output, "w", encoding="utf-8", newline="") as writer:
+        concatenate_files_to(writer, files, source, "https://github.com/test/repo", "")
+    streamed = output.read_bytes().decode("utf-8")
+
+    assert streamed.endswith("".join(f"\n\nFile: {f.name}\n{f.read_text()}" for f in files))
+    assert streamed.endswith("File: a.txt\nfirst\n\n\nFile: b.txt\nsecond\nthird\n")
@@ -1,6 +1,6 @@
 """Test for LLM integration functionality."""
 import pytest
-from repomix.utils.llm import query_model
+from repomix.utils.llm import query_model, response_cache_key, load_cached_response, store_cached_response
 from repomix.utils.models import LLMResponse, TokenUsage
 
 TEST_MODEL = "gpt-3.5-turbo"
@@ -27,4 +27,21 @@ function hello() { return 'world'; }
     # Model name might include version suffix
     assert response.metadata["model"].startswith(TEST_MODEL)
     assert isinstance(response.usage, TokenUsage)
-    assert response.usage.total_tokens == response.usage.completion_tokens + response.usage.prompt_tokens 
\ No newline at end of file
+    assert response.usage.total_tokens == response.usage.completion_tokens + response.usage.prompt_tokens 
+def test_response_cache_round_trip():
+    """Test cached responses are keyed by request settings and marked as cache hits."""
+    response = LLMResponse(
+        response="cached analysis",
+        metadata={"model": TEST_MODEL},
+        usage=TokenUsage(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+    )
+    key = response_cache_key(TEST_MODEL, "print('hi')", "system", 100)
+    assert load_cached_response(key) is None
+    assert key != response_cache_key(TEST_MODEL, "print('hi')", "other system", 100)
+
+    store_cached_response(key, response)
+    cached = load_cached_response(key)
+
+    assert cached.response == "cached analysis"
+    assert cached.usage == response.usage
+    assert cached.metadata["cache_hit"] is True
@@ -1,18 +1,96 @@
 """Test for repository cloning functionality."""
+import subprocess
 import pytest
 from pathlib import Path
-from repomix.utils.git import clone_repository, cleanup_repository
+from repomix.utils.git import clone_repository, clone_repository_async, cleanup_repository, clone_github_repo
 
 def test_repository_cloning():
     """Test cloning a repository."""
     repo_url = "https://github.com/raycast/script-commands"
     branch = "master"
     
-    repo_dir = clone_repository(repo_url, branch)
+    # Shallow, blobless and sparse: only commands/browsing is fetched
+    repo_dir = clone_repository(repo_url, branch, ["/commands/browsing"])
     try:
         assert repo_dir.exists()
         assert (repo_dir / "commands").exists()
         assert (repo_dir / ".git").exists()
     finally:
         cleanup_repository(repo_dir)
-        assert not repo_dir.exists() 
\ No newline at end of file
+        assert not repo_dir.exists() 
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_async", [False, True])
+async def test_sparse_clone_checks_out_only_target_dirs(tmp_path, use_async):
+    """Test a clone restricted to target directories leaves other directories out."""
+    source = tmp_path / "source"
+    for path in ("commands/browsing/open.sh", "commands/media/play.sh"):
+        (source / path).parent.mkdir(parents=True, exist_ok=True)
+        (source / path).write_text(path)
+    subprocess.run(["git", "-C", str(source), "init", "-q", "-b", "master"], check=True)
+    subprocess.run(["git", "-C", str(source), "add", "."], check=True)
+    subprocess.run(
+        ["git", "-C", str(source), "-c", "user.name=test", "-c", "user.email=test@example.com",
+         "commit", "-q", "-m", "init"],
+        check=True
+    )
+
+    if use_async:
+        repo_dir = await clone_repository_async(source.as_uri(), "master", ["/commands/browsing"])
+    else:
+        repo_dir = clone_repository(source.as_uri(), "master", ["/commands/browsing"])
+    try:
+        assert (repo_dir / "commands" / "browsing" / "open.sh").exists()
+        assert not (repo_dir / "commands" / "media").exists()
+    finally:
+        cleanup_repository(repo_dir)
+
+@pytest.mark.asyncio
+async def test_clone_repository_async_removes_temp_dir_on_error(tmp_path, monkeypatch):
+    """Test the temporary clone directory is removed when git cannot be started."""
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    async def missing_git(*args, **kwargs):
+        raise FileNotFoundError("git")
+    monkeypatch.setattr("asyncio.create_subprocess_exec", missing_git)
+
+    with pytest.raises(FileNotFoundError):
+        await clone_repository_async("https://github.com/raycast/script-commands", "master")
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_clone_github_repo_uses_pygit2_when_available(monkeypatch):
+    """Test clones go through pygit2 in-process when it is installed."""
+    cloned = []
+    class FakePygit2:
+        @staticmethod
+        def clone_repository(url, path, callbacks=None):
+            cloned.append((url, callbacks))
+            (Path(path) / "README.md").write_text("cloned")
+
+    monkeypatch.setattr("repomix.utils.git.pygit2", FakePygit2)
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+
+    repo_dir = await clone_github_repo("https://github.com/raycast/script-commands/tree/master/commands")
+    try:
+        assert cloned == [("https://github.com/raycast/script-commands", None)]
+        assert (Path(repo_dir) / "README.md").read_text() == "cloned"
+    finally:
+        cleanup_repository(Path(repo_dir))
+
+@pytest.mark.asyncio
+async def test_clone_github_repo_removes_temp_dir_on_failure(monkeypatch):
+    """Test a failed clone does not leave its temporary directory behind."""
+    created = []
+    class FailingPygit2:
+        @staticmethod
+        def clone_repository(url, path, callbacks=None):
+            created.append(Path(path))
+            (Path(path) / "partial").write_text("half a clone")
+            raise OSError("connection reset")
+
+    monkeypatch.setattr("repomix.utils.git.pygit2", FailingPygit2)
+
+    with pytest.raises(ValueError, match="connection reset"):
+        await clone_github_repo("https://github.com/raycast/script-commands")
+    assert len(created) == 1
+    assert not created[0].exists()
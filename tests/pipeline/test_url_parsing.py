@@ -8,4 +8,11 @@ def test_directory_url_parsing():
     repo_url, branch, target_dir = parse_github_url(url)
     assert repo_url == "https://github.com/raycast/script-commands"
     assert branch == "master"
-    assert target_dir == "/commands/browsing" 
\ No newline at end of file
+    assert target_dir == "/commands/browsing" 
+def test_url_parsing_is_cached():
+    """Test repeated parses of the same URL are served from the cache."""
+    parse_github_url.cache_clear()
+    url = "https://github.com/raycast/script-commands/tree/master/commands/browsing"
+    assert parse_github_url(url) == parse_github_url(url)
+    info = parse_github_url.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
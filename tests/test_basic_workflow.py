@@ -1,20 +1,27 @@
 """Test the basic workflow of repomix."""
 import pytest
+import asyncio
 from pathlib import Path
-import json
-from repomix.utils.git import parse_github_url, clone_repository, cleanup_repository
-from repomix.utils.parser import glob_files, concatenate_files
-from repomix.utils.llm import query_model, save_response, LLMResponse
+import httpx
+from repomix.utils.git import parse_github_url
+from repomix.utils.parser import glob_files, concatenate_files_to
+from repomix.utils.file_utils import load_json
+from repomix.utils.llm import query_model, save_response, LLMResponse, HTTP_LIMITS, HTTP_TIMEOUT
 from click.testing import CliRunner
-from repomix.cli import cli
+from repomix.cli import cli, ask_core
 
 # Real repository URL for testing
 TEST_URL = "https://github.com/raycast/script-commands/tree/master/commands/browsing"
 TEST_MODEL = "gpt-4o-mini"
 TEST_QUESTION = "What do these scripts do?"
+TEST_QUESTIONS = [
+    TEST_QUESTION,
+    "Which browsers do these scripts support?",
+    "What dependencies do these scripts need?"
+]
 
 @pytest.mark.asyncio
-async def test_basic_url_workflow():
+async def test_basic_url_workflow(raycast_repo, tmp_path):
     """Test the most basic workflow with a real GitHub repository."""
     # 1. Parse URL
     repo_url, branch, target_dir = parse_github_url(TEST_URL)
@@ -22,46 +29,46 @@ async def test_basic_url_workflow():
     assert branch == "master"
     assert target_dir == "/commands/browsing"
     
-    # 2. Clone real repo
-    repo_dir = clone_repository(repo_url, branch)
-    try:
-        assert repo_dir.exists()
-        target_path = repo_dir / target_dir.lstrip('/')
-        assert target_path.exists()
-        
-        # 3. Find actual files
-        ignore_patterns = ["*.pyc", "__pycache__/*", "*.png", "*.jpg", "images/*"]
-        files = glob_files(repo_dir, target_dir, ignore_patterns)
-        assert len(files) > 0
-        
-        # 4. Concatenate real files
-        content = concatenate_files(files, repo_dir, TEST_URL, target_dir)
-        assert len(content) > 0
-        
-        # Save concatenated content for verification
-        output_dir = Path("tests/output")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        (output_dir / "concatenated.txt").write_text(content)
-        
-        # 5. Query real LLM
-        system_prompt = f"Analyze these scripts and answer: {TEST_QUESTION}"
-        response = await query_model(TEST_MODEL, content, system_prompt)
-        
-        # Save and verify real response
-        response_path = output_dir / "response.json"
-        if isinstance(response, LLMResponse):  # Handle the Union type
-            save_response(response, str(response_path))  # Convert Path to str
-        
-        # Verify response structure
-        response_data = json.loads(response_path.read_text())
-        assert "response" in response_data
-        assert "metadata" in response_data
-        assert "usage" in response_data
-        assert response_data["usage"]["total_tokens"] > 0
-        
-    finally:
-        # Clean up real repository
-        cleanup_repository(repo_dir)
+    # 2. Check out the real repo from the cached mirror
+    repo_dir = raycast_repo
+    assert repo_dir.exists()
+    target_path = repo_dir / target_dir.lstrip('/')
+    assert target_path.exists()
+    
+    # 3. Find actual files
+    ignore_patterns = ["*.pyc", "__pycache__/*", "*.png", "*.jpg", "images/*"]
+    files = glob_files(repo_dir, target_dir, ignore_patterns)
+    assert len(files) > 0
+    
+    # 4. Concatenate real files, streaming them to disk for verification
+    output_dir = tmp_path
+    concat_path = output_dir / "concatenated.txt"
+    with open(concat_path, "w", encoding="utf-8") as writer:
+        concatenate_files_to(writer, files, repo_dir, TEST_URL, target_dir)
+    assert concat_path.stat().st_size > 0
+    content = concat_path.read_text(encoding="utf-8")
+    
+    # 5. Query real LLM with several questions at once over one shared client
+    async with httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT) as session:
+        responses = await asyncio.gather(*[
+            query_model(TEST_MODEL, content, f"Analyze these scripts and answer: {question}", session=session)
+            for question in TEST_QUESTIONS
+        ])
+    assert len(responses) == len(TEST_QUESTIONS)
+    assert all(isinstance(r, LLMResponse) and r.response for r in responses)
+    response = responses[0]
+    
+    # Save and verify real response
+    response_path = output_dir / "response.json"
+    if isinstance(response, LLMResponse):  # Handle the Union type
+        save_response(response, str(response_path))  # Convert Path to str
+    
+    # Verify response structure
+    response_data = load_json(response_path)
+    assert "response" in response_data
+    assert "metadata" in response_data
+    assert "usage" in response_data
+    assert response_data["usage"]["total_tokens"] > 0
 
 def test_ask_command():
     """Test the ask command with a real directory."""
@@ -81,6 +88,17 @@ def test_ask_command():
     assert result.exit_code == 0
     assert "Starting analysis of repository" in result.stderr
 
+@pytest.mark.asyncio
+async def test_ask_core(capsys):
+    """Test the ask command's logic can be awaited directly, without the CLI wrapper."""
+    test_dir = Path("src/repomix")
+    assert test_dir.exists(), "Test directory must exist"
+    
+    exit_code = await ask_core(str(test_dir), "What does this code do?", TEST_MODEL)
+    
+    assert exit_code == 0
+    assert "Starting analysis of repository" in capsys.readouterr().err
+
 def test_ask_error_handling():
     """Test error handling with real error conditions."""
     runner = CliRunner(mix_stderr=False)
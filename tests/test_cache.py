@@ -0,0 +1,200 @@
+"""Tests for the SQLite-backed schema cache."""
+import json
+import sqlite3
+import time
+import zlib
+import pytest
+from repomix.utils.cache import SchemaCache, TimingManager, DICT_TRAINING_SAMPLES, FORMAT_ZSTD_DICT
+
+@pytest.fixture
+def cache(temp_dir):
+    """Create a schema cache in a temporary directory."""
+    return SchemaCache(cache_dir=temp_dir)
+
+def test_cache_round_trip(cache):
+    """Test small and compressed entries are returned unchanged."""
+    small = {"fields": ["id", "name"]}
+    large = {"fields": [f"field_{i}" for i in range(500)]}
+    cache.set("db", "users", "schema", small)
+    cache.set("db", "orders", "schema", large)
+
+    assert cache.get("db", "users", "schema") == small
+    assert cache.get("db", "orders", "schema") == large
+    assert cache.get("db", "missing", "schema") is None
+
+    cache.clear()
+    assert cache.get("db", "users", "schema") is None
+
+def test_cache_uses_wal_journal(cache):
+    """Test the database is switched to write-ahead logging."""
+    with cache._connect() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+def test_cache_reuses_connection(cache):
+    """Test operations share one connection that is reopened after close."""
+    with cache._lock:
+        conn = cache._connect()
+    cache.set("db", "users", "schema", {"fields": ["id"]})
+    assert cache.get("db", "users", "schema") == {"fields": ["id"]}
+    assert cache._connect() is conn
+
+    cache.close()
+    assert cache.get("db", "users", "schema") == {"fields": ["id"]}
+    assert cache._connect() is not conn
+
+def test_cache_compression_formats(cache):
+    """Test legacy zlib rows still decode and a dictionary is trained from cached entries."""
+    legacy = {"fields": [f"legacy_{i}" for i in range(500)]}
+    with cache._lock, cache._connect() as conn:
+        conn.execute(
+            "INSERT INTO schema_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ("db", "legacy", "schema", zlib.compress(json.dumps(legacy).encode()), "", time.time(), 0, 1)
+        )
+    assert cache.get("db", "legacy", "schema") == legacy
+
+    entries = {
+        f"coll_{i}": {"collection": f"coll_{i}", "fields": {"id": "int", "name": "str", "index": i}}
+        for i in range(DICT_TRAINING_SAMPLES * 2)
+    }
+    for name, data in entries.items():
+        cache.set("db", name, "schema", data)
+
+    assert cache._zstd_dict is not None
+    cache.set("db", "after_training", "schema", {"fields": {"id": "int"}})
+    with cache._lock, cache._connect() as conn:
+        blob_format = conn.execute(
+            "SELECT compressed FROM schema_cache WHERE collection_name = 'after_training'"
+        ).fetchone()[0]
+    assert blob_format == FORMAT_ZSTD_DICT
+    assert cache.get("db", "after_training", "schema") == {"fields": {"id": "int"}}
+
+    # The dictionary is persisted and reloaded by a new instance
+    reopened = SchemaCache(cache_dir=cache.cache_dir)
+    assert all(reopened.get("db", name, "schema") == data for name, data in entries.items())
+
+def test_cache_counts_rows_only_when_training_is_due(cache):
+    """Test writes below the training threshold don't run COUNT(*) on the table."""
+    statements = []
+    with cache._lock:
+        cache._connect().set_trace_callback(statements.append)
+    for i in range(DICT_TRAINING_SAMPLES - 1):
+        cache.set("db", f"coll_{i}", "schema", {"index": i})
+    assert not any("COUNT(*)" in sql for sql in statements)
+
+    # A reopened cache picks up the existing rows instead of starting from zero
+    reopened = SchemaCache(cache_dir=cache.cache_dir)
+    assert reopened._entry_count == DICT_TRAINING_SAMPLES - 1
+
+    cache.set("db", "last", "schema", {"index": -1})
+    assert sum("COUNT(*)" in sql for sql in statements) == 1
+
+def test_schema_hash_ignores_key_order(cache):
+    """Test the stored schema hash depends on content, not key order."""
+    cache.set("db", "a", "schema", {"id": "int", "name": "str"})
+    cache.set("db", "b", "schema", {"name": "str", "id": "int"})
+    cache.set("db", "c", "schema", {"id": "int", "name": "text"})
+    with cache._lock, cache._connect() as conn:
+        hashes = dict(conn.execute("SELECT collection_name, schema_hash FROM schema_cache").fetchall())
+    assert hashes["a"] == hashes["b"] != hashes["c"]
+
+def test_cache_set_many(cache):
+    """Test several entries are written together."""
+    cache.set_many([
+        ("db", "users", "schema", {"fields": ["id"]}),
+        ("db", "orders", "schema", {"fields": ["total"]}),
+    ])
+    assert cache.get("db", "users", "schema") == {"fields": ["id"]}
+    assert cache.get("db", "orders", "schema") == {"fields": ["total"]}
+
+def test_cleanup_evicts_oldest_entries_over_size_limit(temp_dir):
+    """Test size-based cleanup keeps the newest entries that fit."""
+    cache = SchemaCache(max_size_mb=1, cache_dir=temp_dir)
+    rows = [
+        ("db", f"coll_{i}", "schema", b"x", "", float(i), 300 * 1024, 0)
+        for i in range(5)
+    ]
+    with cache._lock, cache._connect() as conn:
+        conn.executemany("INSERT INTO schema_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        # Keep the rows clear of age-based expiry
+        conn.execute("UPDATE schema_cache SET timestamp = timestamp + ?", (time.time(),))
+
+    cache._cleanup_if_needed()
+
+    with cache._lock, cache._connect() as conn:
+        remaining = [r[0] for r in conn.execute(
+            "SELECT collection_name FROM schema_cache ORDER BY timestamp"
+        )]
+    assert remaining == ["coll_2", "coll_3", "coll_4"]
+
+def test_cleanup_is_throttled(cache, monkeypatch):
+    """Test cleanup runs once per interval of get/set calls rather than on every call."""
+    calls = []
+    monkeypatch.setattr(cache, "_cleanup_if_needed", lambda: calls.append(1))
+    cache._cleanup_every = 10
+
+    for i in range(15):
+        cache.get("db", f"coll_{i}", "schema")
+    cache.set("db", "users", "schema", {"fields": ["id"]})
+    assert len(calls) == 2
+
+def test_rowid_table_is_migrated(temp_dir):
+    """Test a legacy rowid cache table is rebuilt WITHOUT ROWID with its entries intact."""
+    with sqlite3.connect(temp_dir / "schema_analysis_cache.db") as conn:
+        conn.execute("""
+            CREATE TABLE schema_cache (
+                database_name TEXT, collection_name TEXT, analysis_type TEXT, data BLOB,
+                schema_hash TEXT, timestamp REAL, size INTEGER, compressed BOOLEAN,
+                PRIMARY KEY (database_name, collection_name, analysis_type)
+            )
+        """)
+        conn.execute(
+            "INSERT INTO schema_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ("db", "users", "schema", b'{"fields": ["id"]}', "", time.time(), 18, 0)
+        )
+    conn.close()
+
+    cache = SchemaCache(cache_dir=temp_dir)
+    assert cache.get("db", "users", "schema") == {"fields": ["id"]}
+    with cache._lock, cache._connect() as conn:
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'schema_cache'").fetchone()[0]
+        assert "WITHOUT ROWID" in ddl
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+
+def test_timing_manager_accumulates_stats():
+    """Test repeated measurements accumulate under one operation name."""
+    timing = TimingManager()
+    for _ in range(3):
+        with timing.measure("lookup", "cache lookup"):
+            pass
+    with timing.measure("store"):
+        pass
+
+    summary = timing.get_summary()
+    assert summary["lookup"]["calls"] == 3
+    assert summary["store"]["calls"] == 1
+    assert timing.stats["lookup"].operation == "lookup"
+
+def test_recompress_all_pages_through_entries(cache, monkeypatch):
+    """Test recompression rewrites every entry across several pages."""
+    monkeypatch.setattr("repomix.utils.cache.RECOMPRESS_BATCH_SIZE", 3)
+    entries = {f"coll_{i}": {"fields": [f"field_{j}" for j in range(200)], "index": i} for i in range(10)}
+    for name, data in entries.items():
+        cache.set("db", name, "schema", data)
+
+    stats = cache.recompress_all(new_level=9)
+
+    assert stats["total"] == 10
+    assert stats["compressed"] == 10
+    assert all(cache.get("db", name, "schema") == data for name, data in entries.items())
+
+def test_recompress_all_includes_empty_keys(cache):
+    """Test the first page also covers an entry whose key parts are all empty strings."""
+    data = {"fields": [f"field_{j}" for j in range(200)]}
+    cache.set("", "", "", data)
+    cache.set("db", "coll", "schema", data)
+
+    stats = cache.recompress_all(new_level=9)
+
+    assert stats["total"] == 2
+    assert cache.get("", "", "") == data
@@ -5,8 +5,19 @@ from repomix.utils.cache_manager import initialize_litellm_cache
 import litellm
 import redis
 import os
+import time
 
-def test_litellm_cache_initialization():
+# Keep the tests that share Redis state on one xdist worker
+pytestmark = pytest.mark.xdist_group("redis")
+
+@pytest.fixture(scope="module")
+def redis_pool():
+    """Share one Redis connection pool across the module's tests."""
+    pool = redis.ConnectionPool(host="localhost", port=6379, max_connections=16)
+    yield pool
+    pool.disconnect()
+
+def test_litellm_cache_initialization(redis_pool):
     """Test LiteLLM cache initialization with Redis."""
     logger.info("Testing LiteLLM cache initialization")
     
@@ -18,7 +29,7 @@ def test_litellm_cache_initialization():
     assert litellm.cache.type == "redis"
     
     # Test Redis connection directly
-    redis_client = redis.Redis(host="localhost", port=6379)
+    redis_client = redis.Redis(connection_pool=redis_pool)
     assert redis_client.ping(), "Redis server should be reachable"
 
 def test_litellm_cache_fallback():
@@ -42,32 +53,45 @@ def test_litellm_cache_fallback():
         # Reset Redis port
         os.environ["REDIS_PORT"] = original_port
 
-def test_litellm_cache_completion():
-    """Test cache functionality with completion call."""
+def test_litellm_cache_completion(redis_pool):
+    """Test a completion response is written to the Redis cache."""
     logger.info("Testing LiteLLM cache with completion")
     
     # Initialize with Redis cache
     initialize_litellm_cache()
     
     test_messages = [{"role": "user", "content": "Test message"}]
-    
-    # First call
-    response1 = litellm.completion(
+    litellm.completion(
         model="gpt-4o-mini",
         messages=test_messages,
         cache={"no-cache": False}
     )
     
-    # Second call should hit cache
-    response2 = litellm.completion(
-        model="gpt-4o-mini",
-        messages=test_messages,
-        cache={"no-cache": False}
-    )
+    # Check the entry under litellm's own key instead of making a second call;
+    # the write may land just after the response is returned
+    cache_key = litellm.cache.get_cache_key(model="gpt-4o-mini", messages=test_messages)
+    redis_client = redis.Redis(connection_pool=redis_pool)
+    deadline = time.monotonic() + 2
+    while not redis_client.exists(cache_key) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert redis_client.exists(cache_key)
+
+@pytest.mark.slow
+def test_litellm_cache_completion_hit():
+    """Test a repeated completion call is served from the cache end to end."""
+    initialize_litellm_cache()
+    
+    test_messages = [{"role": "user", "content": "Test message"}]
+    for _ in range(2):
+        response = litellm.completion(
+            model="gpt-4o-mini",
+            messages=test_messages,
+            cache={"no-cache": False}
+        )
     
-    assert response2._hidden_params.get("cache_hit") is True
+    assert response._hidden_params.get("cache_hit") is True
 
-def test_litellm_cache_operations():
+def test_litellm_cache_operations(redis_pool):
     """Test basic LiteLLM cache operations."""
     logger.info("Testing LiteLLM cache operations")
     
@@ -75,17 +99,22 @@ def test_litellm_cache_operations():
     initialize_litellm_cache()
     
     # Test direct Redis operations
-    redis_client = redis.Redis(host="localhost", port=6379)
+    redis_client = redis.Redis(connection_pool=redis_pool)
     
-    # Test set and get
+    # Set, get, delete and get again in a single round trip
     key = "test_key"
     value = "test_value"
-    redis_client.set(key, value)
-    assert redis_client.get(key).decode() == value
+    pipe = redis_client.pipeline()
+    pipe.set(key, value)
+    pipe.get(key)
+    pipe.delete(key)
+    pipe.get(key)
+    set_ok, stored, deleted, after_delete = pipe.execute()
     
-    # Test delete
-    redis_client.delete(key)
-    assert redis_client.get(key) is None
+    assert set_ok
+    assert stored.decode() == value
+    assert deleted == 1
+    assert after_delete is None
 
 def test_litellm_cache_error_handling():
     """Test LiteLLM cache error handling."""
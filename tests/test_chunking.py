@@ -1,7 +1,29 @@
+import re
 import pytest
 from typing import Dict
-from repomix.utils.parser import chunk_content
-from repomix.utils.spacy_utils import count_tokens
+from concurrent.futures import ThreadPoolExecutor
+from repomix.utils.parser import chunk_content, split_long_line, _PartHeaderTokens
+from repomix.utils import token_utils
+from repomix.utils.token_utils import count_tokens, count_tokens_batch, get_cl100k_tokenizer, split_text_into_chunks
+
+# Header of a numbered file part, e.g. "File: 001_big_file.py"
+PART_HEADER_RE = re.compile(r"File: (\d{3})_")
+
+def _contains(chunks, needle):
+    """Check whether any chunk contains ``needle`` without joining the chunks."""
+    return any(needle in chunk for chunk in chunks)
+
+@pytest.fixture(scope="module", autouse=True)
+def warm_tokenizers():
+    """Load the BPE encodings once, before the first test rather than during it."""
+    get_cl100k_tokenizer().count("warmup")
+    count_tokens("warmup")
+
+@pytest.fixture(scope="module")
+def two_file_limit():
+    """Token limit that fits two of the small sample files per chunk but not three."""
+    two_files, = count_tokens_batch(["File: a.py\nprint('first')\n\nFile: b.py\nprint('second')"])
+    return two_files + 1
 
 def test_chunking_under_limit():
     """Test that when total content is under the token limit, a single chunk is produced."""
@@ -26,14 +48,10 @@ def test_chunking_over_limit():
     # Verify sequential numbering
     seen_numbers = set()
     for chunk in chunks:
-        # Each chunk should start with a header
-        assert chunk.startswith("File:"), "Chunk does not start with 'File:' header"
-        header = chunk.split("\n", 1)[0]
-        # Extract the numeric prefix
-        prefix = header.split("_")[0].split(" ")[1]  # "File: 001" -> "001"
-        assert len(prefix) == 3, "Expected 3-digit numeric prefix"
-        assert prefix.isdigit(), "Prefix should be numeric"
-        seen_numbers.add(int(prefix))
+        # Each chunk should start with a header carrying a 3-digit part number
+        match = PART_HEADER_RE.match(chunk)
+        assert match, "Chunk does not start with a 'File: NNN_' header"
+        seen_numbers.add(int(match.group(1)))
     
     # Verify numbers are sequential
     expected_numbers = set(range(1, len(chunks) + 1))
@@ -51,7 +69,7 @@ def test_chunking_newline_handling():
         assert not chunk.endswith("\n"), "Chunk should not end with a newline"
         assert chunk.startswith("File:"), "Chunk should start with 'File:' header"
 
-def test_chunking_file_combining():
+def test_chunking_file_combining(two_file_limit):
     """Test that files are combined into chunks when possible."""
     content = {
         "a.py": "print('first')",
@@ -59,16 +77,13 @@ def test_chunking_file_combining():
         "c.py": "print('third')"
     }
     
-    # Set a token limit that should allow at least two files per chunk
-    small_limit = count_tokens("File: a.py\nprint('first')") * 2 + 10
-    
-    chunks = chunk_content(content, token_limit=small_limit)
+    # Use a token limit that allows two files per chunk but not all three
+    chunks = chunk_content(content, token_limit=two_file_limit)
     assert 1 < len(chunks) < len(content), "Files should be combined when possible"
     
     # Verify all files are present
-    all_content = "\n".join(chunks)
     for filename in content.keys():
-        assert f"File: {filename}" in all_content, f"Missing file: {filename}"
+        assert _contains(chunks, f"File: {filename}"), f"Missing file: {filename}"
 
 def test_single_line_over_limit():
     """Test handling of a single line that exceeds the token limit."""
@@ -79,9 +94,8 @@ def test_single_line_over_limit():
     chunks = chunk_content(content, token_limit=4000)
     
     assert len(chunks) > 1, "Long line should be split into multiple chunks"
-    for chunk in chunks:
-        assert chunk.startswith("File: "), "Each chunk should have a header"
-        assert count_tokens(chunk) <= 4000, "Each chunk should be under token limit"
+    assert all(chunk.startswith("File: ") for chunk in chunks), "Each chunk should have a header"
+    assert max(count_tokens_batch(chunks)) <= 4000, "Each chunk should be under token limit"
 
 def test_empty_file_handling():
     """Test that empty files are handled correctly."""
@@ -92,9 +106,8 @@ def test_empty_file_handling():
     chunks = chunk_content(content, token_limit=4000)
     
     # Empty file should still have a header
-    all_content = "\n".join(chunks)
-    assert "File: empty.py" in all_content, "Empty file should have a header"
-    assert "File: normal.py" in all_content, "Normal file should be present"
+    assert _contains(chunks, "File: empty.py"), "Empty file should have a header"
+    assert _contains(chunks, "File: normal.py"), "Normal file should be present"
 
 def test_small_token_limit():
     """Test behavior with a very small token limit."""
@@ -104,9 +117,9 @@ def test_small_token_limit():
     chunks = chunk_content(content, token_limit=small_limit)
     
     # Verify each chunk is properly formatted even with tiny limit
-    for chunk in chunks:
-        assert chunk.startswith("File: "), "Each chunk should have a header"
-        assert count_tokens(chunk) > 0, "Chunks should not be empty"
+    assert chunks, "Expected at least one chunk"
+    assert all(chunk.startswith("File: ") for chunk in chunks), "Each chunk should have a header"
+    assert min(count_tokens_batch(chunks)) > 0, "Chunks should not be empty"
 
 def test_deterministic_output():
     """Test that chunking produces the same output for the same input."""
@@ -121,5 +134,77 @@ def test_deterministic_output():
     
     assert chunks1 == chunks2, "Chunking should be deterministic"
     # Verify files are processed in sorted order
-    all_content = "\n".join(chunks1)
-    assert all_content.index("File: a.py") < all_content.index("File: b.py"), "Files should be processed in sorted order" 
\ No newline at end of file
+    headers = [line[len("File: "):] for chunk in chunks1 for line in chunk.splitlines() if line.startswith("File: ")]
+    assert headers == ["a.py", "b.py", "c.py"], "Files should be processed in sorted order"
+
+def test_split_long_line_keeps_multibyte_characters_whole():
+    """Test token-boundary cuts never split a multi-byte character."""
+    line = "s = '" + "café 日本語 🎉 " * 200 + "'"
+    chunks = split_long_line(line, "unicode.py", 1, 50)
+
+    assert max(count_tokens_batch(chunks)) <= 50
+    assert "".join(chunk.split("\n", 1)[1] for chunk in chunks) == line
+
+def test_part_header_tokens_follow_part_number():
+    """Test header counts are memoized per part number, since four-digit numbers cost more."""
+    header_tokens = _PartHeaderTokens("main.py")
+    for part_number in (1, 999, 1000):
+        expected = count_tokens(f"File: {part_number:03d}_main.py\n")
+        assert header_tokens[part_number] == expected
+    assert header_tokens[1000] > header_tokens[999]
+    assert set(header_tokens) == {1, 999, 1000}
+
+def test_cl100k_tokenizer_backends_agree(monkeypatch):
+    """Test the rs-bpe backend, when installed, tokenizes exactly like tiktoken."""
+    pytest.importorskip("rs_bpe")
+    from repomix.utils import token_utils
+    text = "def f(x):\n    return 'café 日本語 🎉'  # <|endoftext|>\n" * 20
+
+    token_utils.get_cl100k_tokenizer.cache_clear()
+    fast = token_utils.get_cl100k_tokenizer()
+    monkeypatch.setattr(token_utils, "rs_bpe_openai", None)
+    token_utils.get_cl100k_tokenizer.cache_clear()
+    fallback = token_utils.get_cl100k_tokenizer()
+    token_utils.get_cl100k_tokenizer.cache_clear()
+
+    assert (fast.backend, fallback.backend) == ("rs-bpe", "tiktoken")
+    assert fast.encode(text) == fallback.encode(text)
+    assert fast.count(text) == fallback.count(text) == count_tokens(text)
+    assert count_tokens_batch([text, "", text]) == [count_tokens(text), 0, count_tokens(text)]
+    assert count_tokens_batch([text], model="gpt-4o") == [count_tokens(text, model="gpt-4o")]
+    partial = fast.encode("🎉")[:1]
+    assert fast.decode(partial) is None and fallback.decode(partial) is None
+
+
+def test_chunk_token_estimates_match_counts():
+    """Test merged chunks stay within the limit when measured directly."""
+    contents = {f"file_{i:02d}.py": f"def f_{i}():\n    return {i}  \n" * (i % 7 + 1) for i in range(40)}
+    chunks = chunk_content(contents, token_limit=300)
+    assert 1 < len(chunks) < len(contents)
+    assert max(count_tokens_batch(chunks)) <= 300
+
+
+def test_parallel_chunking_matches_serial(monkeypatch):
+    """Test threaded per-file chunking packs files in the same order as a serial run."""
+    contents = {f"file_{i:02d}.py": f"value_{i} = {i}\n" * (i * 13 % 50 + 1) for i in range(30)}
+    contents["long.txt"] = "word " * 400
+    parallel = chunk_content(contents, token_limit=200)
+    monkeypatch.setattr("repomix.utils.parser.CHUNK_WORKERS", 1)
+    assert chunk_content(contents, token_limit=200) == parallel
+    assert parallel[-1].startswith("File: 003_long.txt")
+
+def test_split_text_into_chunks_slices_long_lines():
+    """Test lines longer than the chunk size are cut into consecutive fixed-size pieces."""
+    text = "short\n" + "x" * 25 + "\ntail"
+    assert split_text_into_chunks(text, chunk_size=10) == ["short", "x" * 10, "x" * 10, "x" * 5, "tail"]
+    assert split_text_into_chunks(text, chunk_size=len(text)) == [text]
+
+def test_count_tokens_memo_is_thread_safe(monkeypatch):
+    """Test concurrent counts keep the bounded memo consistent and return correct counts."""
+    monkeypatch.setattr("repomix.utils.token_utils.TOKEN_COUNT_CACHE_SIZE", 8)
+    texts = [f"text number {i}" for i in range(16)]
+    expected = count_tokens_batch(texts)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        counts = list(executor.map(count_tokens, texts * 200))
+    assert counts == expected * 200
+    assert len(token_utils._token_count_cache) <= 8
@@ -1,4 +1,5 @@
 """Tests for file operations utilities."""
+import json
 import os
 from pathlib import Path
 import pytest
@@ -9,11 +10,23 @@ from repomix.utils.file_utils import (
     save_json,
     load_json,
     collect_files,
+    collect_files_iter,
+    collect_content,
     clean_directory,
     is_binary_file,
     is_text_file,
-    get_file_extension
+    get_file_extension,
+    binary_by_extension,
+    compile_ignore_patterns
 )
+from repomix.utils.parser import glob_files
+
+def stat_or_fail(path: Path) -> os.stat_result:
+    """Stat a file the test expects to exist, failing the test if it is missing."""
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        pytest.fail(f"{path} missing")
 
 def test_read_write_file(tmp_path):
     """Test reading and writing files."""
@@ -21,7 +34,7 @@ def test_read_write_file(tmp_path):
     content = "Hello, World!"
     
     write_file(test_file, content)
-    assert test_file.exists()
+    assert stat_or_fail(test_file).st_size == len(content)
     
     read_content = read_file(test_file)
     assert read_content == content
@@ -32,10 +45,17 @@ def test_json_operations(tmp_path):
     data = {"key": "value"}
     
     save_json(test_file, data)
-    assert test_file.exists()
+    assert stat_or_fail(test_file).st_size > 0
     
     loaded_data = load_json(test_file)
     assert loaded_data == data
+    
+    # orjson output stays interchangeable with the standard library
+    nested = {"text": "café ✓", "items": [1, 2.5, None, True], "inner": {"empty": []}}
+    save_json(test_file, nested)
+    assert json.loads(test_file.read_text(encoding="utf-8")) == nested
+    test_file.write_text(json.dumps(nested), encoding="utf-8")
+    assert load_json(test_file) == nested
 
 def test_collect_files(tmp_path):
     """Test collecting files with ignore patterns."""
@@ -53,6 +73,101 @@ def test_collect_files(tmp_path):
     files = collect_files(tmp_path, ["*.pyc", "__pycache__/*"])
     assert len(files) == 2
     assert all(f.suffix in [".txt", ".py"] for f in files)
+    
+    # The lazy walk yields the same files and can stop at the first match
+    assert sorted(e.path for e in collect_files_iter(tmp_path)) == sorted(map(str, collect_files(tmp_path)))
+    assert any(e.name == "file2.py" for e in collect_files_iter(tmp_path, ["*.pyc", "__pycache__/*"]))
+    assert not any(e.name == "cache.pyc" for e in collect_files_iter(tmp_path, ["*.pyc", "__pycache__/*"]))
+
+def test_collect_files_many_patterns(tmp_path):
+    """Test a large ignore list is compiled once per walk rather than once per file."""
+    for i in range(1000):
+        (tmp_path / f"module_{i}.{'py' if i % 2 else 'tmp'}").write_text("x")
+    patterns = [f"*.ext{i}" for i in range(49)] + ["*.tmp"]
+
+    compile_ignore_patterns.cache_clear()
+    files = collect_files(tmp_path, patterns)
+
+    assert len(files) == 500
+    assert all(f.suffix == ".py" for f in files)
+    # Looked up once for files and once for pruning directories, not per file
+    info = compile_ignore_patterns.cache_info()
+    assert info.hits + info.misses == 2
+
+def test_collect_files_prunes_ignored_directories(tmp_path):
+    """Test that directories matched by "dir/*" patterns are skipped entirely."""
+    (tmp_path / "main.py").write_text("content")
+    (tmp_path / "node_modules/pkg").mkdir(parents=True)
+    (tmp_path / "node_modules/index.js").write_text("index")
+    (tmp_path / "node_modules/pkg/lib.js").write_text("lib")
+    
+    files = collect_files(tmp_path, ["node_modules/*"])
+    assert files == [tmp_path / "main.py"]
+
+    # "dir/**" and bare directory names prune the whole subtree too
+    (tmp_path / "build/lib/deep").mkdir(parents=True)
+    (tmp_path / "build/lib/deep/out.js").write_text("out")
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__/main.pyc").write_text("cached")
+    files = collect_files(tmp_path, ["node_modules/*", "build/**", "__pycache__"])
+    assert files == [tmp_path / "main.py"]
+
+def test_collect_files_keeps_directories_matching_file_globs(tmp_path):
+    """Test a wildcard file pattern skips matching files but not a directory with a matching name."""
+    (tmp_path / "app.log").write_text("log")
+    (tmp_path / "build.log").mkdir()
+    (tmp_path / "build.log/report.txt").write_text("report")
+    (tmp_path / "build.log/step.log").write_text("step")
+
+    files = collect_files(tmp_path, ["*.log"])
+    assert files == [tmp_path / "build.log/report.txt"]
+
+def test_collect_files_skips_symlinked_directories(tmp_path):
+    """Test symlinked files are kept while symlinked directories and dangling links are not."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/main.py").write_text("content")
+    (tmp_path / "alias.py").symlink_to(tmp_path / "src/main.py")
+    (tmp_path / "src_link").symlink_to(tmp_path / "src", target_is_directory=True)
+    (tmp_path / "dangling.py").symlink_to(tmp_path / "missing.py")
+
+    assert sorted(collect_files(tmp_path)) == [tmp_path / "alias.py", tmp_path / "src/main.py"]
+
+def test_collect_content_skips_large_and_binary_files(tmp_path):
+    """Test collected content leaves out oversized and binary files."""
+    (tmp_path / "main.py").write_text("print('main')")
+    (tmp_path / "big.py").write_text("x" * (1024 * 1024 + 1))
+    (tmp_path / "blob.dat").write_bytes(b"header\0payload")
+
+    assert sorted(collect_files(tmp_path, max_file_size=1024)) == [tmp_path / "blob.dat", tmp_path / "main.py"]
+    assert collect_content(tmp_path, []) == "=== main.py ===\n\nprint('main')"
+
+def test_ignore_pattern_matching(tmp_path):
+    """Test compiled ignore patterns match like Path.match and the walker applies them."""
+    patterns = ("*.pyc", "__pycache__/*", "docs/*", "[!a]*.md")
+    paths = [
+        "src/module.pyc",
+        "src/__pycache__/module.py",
+        "src/__pycache__/nested/module.py",
+        "docs/index.rst",
+        "project/docs/index.rst",
+        "README.md",
+        "about.md",
+        "src/module.py",
+    ]
+    compiled = compile_ignore_patterns(patterns)
+    for path in paths:
+        expected = any(Path(path).match(pattern) for pattern in patterns)
+        assert (compiled.search(path) is not None) == expected, f"Mismatch for {path}"
+    assert compile_ignore_patterns(()) is None
+    
+    for path in paths:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("x")
+    
+    # Directories named by "dir/*" are pruned whole, nested files included
+    collected = {p.relative_to(tmp_path).as_posix() for p in collect_files(tmp_path, list(patterns))}
+    assert collected == {"about.md", "src/module.py"}
+    assert len(collect_files(tmp_path)) == len(paths)
 
 def test_clean_directory(tmp_path):
     """Test directory cleaning."""
@@ -84,6 +199,45 @@ def test_file_type_detection(tmp_path):
     assert get_file_extension(text_file) == "txt"
     assert get_file_extension(py_file) == "py"
 
+def test_glob_files_sniffs_only_unknown_extensions(tmp_path, monkeypatch):
+    """Test files with a known text or binary extension are classified without being opened."""
+    (tmp_path / "main.py").write_text("print('main')")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\r\n")
+    (tmp_path / "module.so").write_bytes(b"\x7fELF\0")
+    (tmp_path / "notes.unknown").write_text("plain text")
+    (tmp_path / "blob.unknown2").write_bytes(b"a\0b")
+    assert [binary_by_extension(tmp_path / name) for name in ("main.py", "logo.png", "notes.unknown")] == [False, True, None]
+    # Extensions used for text as often as for binary data are left to the sniff
+    assert [binary_by_extension(f"fixture.{ext}") for ext in ("dat", "db", "lib")] == [None, None, None]
+
+    sniffed = []
+    def record(file):
+        sniffed.append(file.name)
+        return is_binary_file(file)
+    monkeypatch.setattr("repomix.utils.parser.is_binary_file", record)
+
+    files = glob_files(tmp_path, "", [])
+    assert sorted(f.name for f in files) == ["main.py", "notes.unknown"]
+    assert sorted(sniffed) == ["blob.unknown2", "notes.unknown"]
+
+def test_glob_files_sniffs_unchanged_files_once(tmp_path, monkeypatch):
+    """Test repeated globs reuse the content sniff until the file changes."""
+    notes = tmp_path / "notes.unknown"
+    notes.write_text("plain text")
+
+    sniffed = []
+    def record(file):
+        sniffed.append(file)
+        return is_binary_file(file)
+    monkeypatch.setattr("repomix.utils.parser.is_binary_file", record)
+
+    assert glob_files(tmp_path, "", []) == glob_files(tmp_path, "", []) == [notes]
+    assert len(sniffed) == 1
+
+    notes.write_bytes(b"now\0binary")
+    assert glob_files(tmp_path, "", []) == []
+    assert len(sniffed) == 2
+
 def test_error_handling(tmp_path):
     """Test error handling in file operations."""
     # Test non-existent file
@@ -1,13 +1,15 @@
 """Tests for multi-directory analysis functionality."""
 from pathlib import Path
 import pytest
+import click
 from click.testing import CliRunner
 from repomix.cli import parse_multi_urls, analyze, cli
 import redis
 import litellm
 import os
+import json
 from loguru import logger
-from repomix.utils.file_utils import load_env_file
+from repomix.utils.file_utils import load_env_file, load_json
 from repomix.utils.multi_directory import (
     analyze_directories,
     combine_results,
@@ -15,7 +17,14 @@ from repomix.utils.multi_directory import (
     validate_directories
 )
 from repomix.utils.llm import initialize_litellm_cache
+from repomix.utils.analyzer import (
+    get_file_content,
+    analyze_multiple_directories_combined,
+    _pack_batches,
+    _split_batch_response
+)
 from unittest.mock import patch
+import asyncio
 
 # Test URLs for different scenarios
 SINGLE_URL = "https://github.com/raycast/script-commands/tree/master/commands/browsing"
@@ -28,9 +37,39 @@ INVALID_MULTI_URLS = [
     "https://github.com/different/repo/tree/master/dir"
 ]
 
-@pytest.fixture(autouse=True)
-def setup_litellm():
-    """Set up LiteLLM cache and API keys before each test."""
+async def mock_completion(**kwargs):
+    """Stand in for litellm.acompletion with a fixed response."""
+    # Raise NotFoundError for invalid model IDs
+    if kwargs.get("model") == "openai/gpt-5":
+        raise litellm.NotFoundError(
+            message="Model not found: openai/gpt-5",
+            model="openai/gpt-5",
+            llm_provider="openai"
+        )
+        
+    return litellm.ModelResponse(
+        id="test-id",
+        choices=[
+            litellm.Choices(
+                message=litellm.Message(
+                    content="Test response",
+                    role="assistant"
+                ),
+                index=0,
+                finish_reason="stop"
+            )
+        ],
+        model=kwargs.get("model", "openai/gpt-4"),
+        usage=litellm.Usage(
+            prompt_tokens=10,
+            completion_tokens=5,
+            total_tokens=15
+        )
+    )
+
+@pytest.fixture(scope="module")
+def litellm_environment():
+    """Load API keys and initialize the LiteLLM cache once for the module."""
     # Load environment variables from .env file
     try:
         load_env_file()
@@ -40,40 +79,16 @@ def setup_litellm():
     
     # Initialize LiteLLM cache
     initialize_litellm_cache()
-    
-    # Mock LiteLLM completion for testing
-    async def mock_completion(**kwargs):
-        # Raise NotFoundError for invalid model IDs
-        if kwargs.get("model") == "openai/gpt-5":
-            raise litellm.NotFoundError(
-                message="Model not found: openai/gpt-5",
-                model="openai/gpt-5",
-                llm_provider="openai"
-            )
-            
-        return litellm.ModelResponse(
-            id="test-id",
-            choices=[
-                litellm.Choices(
-                    message=litellm.Message(
-                        content="Test response",
-                        role="assistant"
-                    ),
-                    index=0,
-                    finish_reason="stop"
-                )
-            ],
-            model=kwargs.get("model", "openai/gpt-4"),
-            usage=litellm.Usage(
-                prompt_tokens=10,
-                completion_tokens=5,
-                total_tokens=15
-            )
-        )
-    
-    # Patch LiteLLM completion
-    with patch("litellm.acompletion", new=mock_completion):
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_litellm(litellm_environment):
+    """Mock LiteLLM completion for every test in the module."""
+    original = litellm.acompletion
+    litellm.acompletion = mock_completion
+    try:
         yield
+    finally:
+        litellm.acompletion = original
 
 def test_parse_multi_urls_single():
     """Test parsing a single URL."""
@@ -129,69 +144,113 @@ def test_parse_multi_urls_with_different_branches():
             "@https://github.com/raycast/script-commands/tree/main/commands/dashboard"
         ])
 
+def test_parse_multi_urls_normalizes_local_paths():
+    """Test local paths are normalized and made relative to their common parent."""
+    result = parse_multi_urls(["/srv/repo/src/", "/srv/repo//docs/api"])
+    assert result.repo_url == "/srv/repo"
+    assert result.target_dirs == ["src", "docs/api"]
+
+    assert parse_multi_urls(["/srv/repo/src"]).target_dirs == ["src"]
+
 def test_parse_multi_urls_invalid():
     """Test parsing invalid URLs."""
     with pytest.raises(ValueError):
         parse_multi_urls([])
 
-def test_analyze_single_directory():
-    """Test analyzing a single directory."""
-    runner = CliRunner()
-    with runner.isolated_filesystem():
-        # Create mock repository structure
-        repo_path = Path("mock_repo")
-        repo_path.mkdir()
-        (repo_path / "dir1").mkdir()
-        (repo_path / "dir1" / "test.py").write_text("print('test1')")
-
-        result = runner.invoke(cli, [
-            "analyze",
-            "@mock_repo/dir1",
-            "--model", "openai/gpt-4o-mini"
-        ])
-
-        assert result.exit_code == 0
-        assert "Processing repository: mock_repo" in result.output
-        assert "Branch: master" in result.output
-
-def test_analyze_multiple_directories():
-    """Test analyzing multiple directories concurrently."""
-    runner = CliRunner()
-    with runner.isolated_filesystem():
-        # Create mock repository structure
-        repo_path = Path("mock_repo")
-        repo_path.mkdir()
-        (repo_path / "dir1").mkdir()
-        (repo_path / "dir2").mkdir()
-
-        # Create test files
-        (repo_path / "dir1" / "test.py").write_text("print('test1')")
-        (repo_path / "dir2" / "test.py").write_text("print('test2')")
-
-        result = runner.invoke(analyze, [
-            "@mock_repo/dir1",
-            "@mock_repo/dir2",
-            "--model", "openai/gpt-4o-mini",
-            "--output-dir", "test_output"
-        ])
-
-        assert result.exit_code == 0
-        assert "Processing repository: mock_repo" in result.output
-        assert "Directories to process: 2" in result.output
-
-def test_analyze_with_combined_analysis():
-    """Test analyzing multiple directories with combined analysis."""
+def build_tree(root, spec):
+    """Write each relative path in spec under root, creating every parent directory once."""
+    created = set()
+    for rel, content in spec.items():
+        path = root / rel
+        if path.parent not in created:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            created.add(path.parent)
+        path.write_bytes(content.encode())
+
+@pytest.fixture(scope="session")
+def mock_repo(tmp_path_factory):
+    """Build mock_repo/dir1 and mock_repo/dir2 once per session (per xdist worker)."""
+    repo_path = tmp_path_factory.mktemp("analyze_cli") / "mock_repo"
+    build_tree(repo_path, {"dir1/test.py": "print('test1')", "dir2/test.py": "print('test2')"})
+    return repo_path
+
+@pytest.fixture
+def mock_repo_fs(mock_repo, tmp_path, monkeypatch):
+    """Run from this test's own tmp_path, with the shared read-only mock_repo linked in.
+    
+    Outputs are written under tmp_path, so no two cases share an output directory.
+    """
+    (tmp_path / "mock_repo").symlink_to(mock_repo, target_is_directory=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.mark.parametrize("args, expected", [
+    pytest.param(
+        ["@mock_repo/dir1"],
+        ["Processing repository: mock_repo", "Branch: master"],
+        id="single-directory"
+    ),
+    pytest.param(
+        ["@mock_repo/dir1", "@mock_repo/dir2", "--output-dir", "test_output"],
+        ["Processing repository: mock_repo", "Directories to process: 2"],
+        id="multiple-directories"
+    ),
+    pytest.param(
+        ["@mock_repo/dir1", "@mock_repo/dir2", "--output-dir", "test_output", "--combined-analysis"],
+        ["Using combined analysis"],
+        id="combined-analysis"
+    ),
+    # Missing directories are warned about, but the command still succeeds
+    pytest.param(
+        ["@nonexistent/dir1", "@nonexistent/dir2"],
+        ["Directory not found"],
+        id="invalid-multi-dirs"
+    ),
+    pytest.param(
+        ["@nonexistent/dir"],
+        ["Directory not found"],
+        id="invalid-dir"
+    ),
+])
+def test_analyze_command(mock_repo_fs, args, expected):
+    """Test the analyze command across directory layouts and flags."""
+    result = CliRunner().invoke(cli, ["analyze", *args, "--model", "openai/gpt-4o-mini"])
+
+    assert result.exit_code == 0
+    for text in expected:
+        assert text in result.output
+    output_dir = args[args.index("--output-dir") + 1] if "--output-dir" in args else "output"
+    assert (mock_repo_fs / output_dir).is_dir()
+
+def test_analyze_command_prints_summary_before_cleanup(mock_repo_fs, monkeypatch):
+    """Test a cloned repository is only removed once the summary has been printed."""
+    events = []
+    async def fake_clone(repo_url, branch, target_dirs):
+        events.append((repo_url, branch, target_dirs))
+        return mock_repo_fs / "mock_repo"
+    monkeypatch.setattr("repomix.cli.clone_repository_async", fake_clone)
+    monkeypatch.setattr("repomix.cli.cleanup_repository", lambda path: events.append("cleanup"))
+    echo = click.echo
+    def record_echo(message=None, **kwargs):
+        events.append(str(message))
+        echo(message, **kwargs)
+    monkeypatch.setattr("repomix.cli.click.echo", record_echo)
+
+    url = "https://github.com/owner/repo/tree/master/dir1"
+    result = CliRunner().invoke(cli, ["analyze", url, "--model", "openai/gpt-4o-mini"])
+
+    assert result.exit_code == 0
+    # Only the requested branch and directory are cloned
+    assert ("https://github.com/owner/repo", "master", ["dir1"]) in events
+    assert events[-1] == "cleanup"
+    assert events[-2].startswith("Results saved in:")
+
+def test_combined_analysis_writes_shards_when_oversized():
+    """Test oversized combined analysis streams per-directory shards and a manifest."""
     runner = CliRunner()
     with runner.isolated_filesystem():
-        # Create mock repository structure
-        repo_path = Path("mock_repo")
-        repo_path.mkdir()
-        (repo_path / "dir1").mkdir()
-        (repo_path / "dir2").mkdir()
-
-        # Create test files
-        (repo_path / "dir1" / "test.py").write_text("print('test1')")
-        (repo_path / "dir2" / "test.py").write_text("print('test2')")
+        padding = "value = 'padding text'\n" * 2000
+        build_tree(Path("mock_repo"), {"dir1/big.py": padding, "dir2/big.py": padding})
 
         result = runner.invoke(analyze, [
             "@mock_repo/dir1",
@@ -202,31 +261,65 @@ def test_analyze_with_combined_analysis():
         ])
 
         assert result.exit_code == 0
-        assert "Using combined analysis" in result.output
+        manifest = Path("test_output/manifest.jsonl").read_text().splitlines()
+        records = sorted((json.loads(line) for line in manifest), key=lambda r: r["directory"])
+        assert [r["directory"] for r in records] == ["dir1", "dir2"]
+        for record in records:
+            shard = load_json(Path("test_output") / record["response_file"])
+            assert shard["analysis"] == "Test response"
+        assert not Path("test_output/combined_analysis.json").exists()
 
-def test_analyze_command_with_invalid_multi_dirs():
-    """Test analyze command with invalid multiple directories."""
-    runner = CliRunner()
-    result = runner.invoke(cli, [
-        "analyze",
-        "@nonexistent/dir1",
-        "@nonexistent/dir2",
-        "--model", "openai/gpt-4o-mini"
-    ])
+@pytest.mark.asyncio
+async def test_oversized_combined_analysis_cancels_batches_on_error(tmp_path):
+    """Test a failed shard batch cancels the other batches and waits for them."""
+    padding = "value = 'padding text'\n" * 2000
+    build_tree(tmp_path, {"dir1/big.py": "BROKEN\n" + padding, "dir2/big.py": padding})
+
+    cancelled = []
+    async def fake_batch_query(model_id, prompts, *args):
+        if "BROKEN" in prompts[0]:
+            raise litellm.NotFoundError(message="Model not found", model=model_id, llm_provider="openai")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Unwinding takes a while, e.g. closing the connection
+            await asyncio.sleep(0.05)
+            cancelled.append(prompts)
+            raise
+
+    with patch("repomix.utils.analyzer._batch_query", new=fake_batch_query):
+        with pytest.raises(litellm.NotFoundError):
+            await asyncio.wait_for(
+                analyze_multiple_directories_combined(
+                    str(tmp_path), ["dir1", "dir2"], "openai/gpt-4o-mini", output_dir=str(tmp_path / "out")
+                ),
+                timeout=5
+            )
+    assert len(cancelled) == 1
+
+def test_get_file_content_deduplicates_across_directories(tmp_path):
+    """Test identical files in sibling directories are emitted once."""
+    for name in ("dir1", "dir2"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "package-lock.json").write_text('{"lockfileVersion": 3}')
+    seen = {}
+    first = get_file_content([tmp_path / "dir1" / "package-lock.json"], seen)
+    second = get_file_content([tmp_path / "dir2" / "package-lock.json"], seen)
+
+    assert '{"lockfileVersion": 3}' in first
+    assert second == (
+        f"File: {tmp_path / 'dir2' / 'package-lock.json'} -> duplicate of "
+        f"{tmp_path / 'dir1' / 'package-lock.json'}\n"
+    )
 
-    assert result.exit_code == 0  # Command succeeds but warns about missing directories
-    assert "Directory not found" in result.output
+def test_batch_packing_and_splitting():
+    """Test directories are packed under the batch limits and batched replies are demuxed."""
+    dir_tokens = {"a": 1000, "b": 1000, "c": 5000, "d": 100, "e": 100, "f": 100, "g": 100, "h": 100}
+    assert _pack_batches(dir_tokens, 6000) == [["a", "b"], ["c", "d", "e", "f"], ["g", "h"]]
 
-def test_cli_error_handling():
-    """Test CLI error handling for invalid directories."""
-    runner = CliRunner()
-    result = runner.invoke(cli, [
-        "analyze",
-        "@nonexistent/dir",
-        "--model", "openai/gpt-4o-mini"
-    ])
-    assert result.exit_code == 0  # Command succeeds but warns about missing directory
-    assert "Directory not found" in result.output
+    assert _split_batch_response('Sure:\n["first", "second"]', 2) == ["first", "second"]
+    assert _split_batch_response('["only one"]', 2) is None
+    assert _split_batch_response("Test response", 2) is None
 
 @pytest.mark.asyncio
 async def test_validate_directories():
@@ -272,8 +365,10 @@ async def test_combine_results():
     logger.info("Testing result combination")
 
     # Process real project directories
-    src_result = await process_directory(Path("src/repomix"))
-    test_result = await process_directory(Path("tests"))
+    src_result, test_result = await asyncio.gather(
+        process_directory(Path("src/repomix")),
+        process_directory(Path("tests"))
+    )
 
     # Combine results
     combined = await combine_results([src_result, test_result])
@@ -312,22 +407,96 @@ async def test_analyze_directories():
         assert "directory_results" in result, "Separate analysis should have directory results"
         assert len(result["directory_results"]) > 0, "Should have analysis for each directory"
 
+@pytest.mark.asyncio
+async def test_analyze_directories_shares_requests_for_identical_content(tmp_path):
+    """Test directories with identical files are analyzed with one model request."""
+    build_tree(tmp_path, {"a/main.py": "same", "b/main.py": "same", "c/main.py": "different"})
+
+    prompts = []
+    async def fake_query_model(model, content, system_prompt):
+        prompts.append(content)
+        return f"analysis {len(prompts)}"
+
+    with patch("repomix.utils.multi_directory.query_model", new=fake_query_model):
+        result = await analyze_directories(
+            [str(tmp_path / name) for name in ("a", "b", "c")],
+            model="openai/gpt-4o-mini",
+            question="What does this do?"
+        )
+
+    analyses = [r["analysis"] for r in result["directory_results"]]
+    assert len(prompts) == 2
+    assert analyses[0] == analyses[1] != analyses[2]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrent", [1, 4, 16])
+async def test_analyze_directories_bounds_directory_concurrency(tmp_path, max_concurrent):
+    """Test no more than max_concurrent directories are processed at once."""
+    names = [f"dir{i}" for i in range(6)]
+    build_tree(tmp_path, {f"{name}/main.py": name for name in names})
+
+    active = peak = 0
+    async def fake_process_directory(directory, repo_url="", target_dir=""):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"files": [str(directory / "main.py")], "content": f"File: main.py\n{directory.name}"}
+
+    async def fake_query_model(model, content, system_prompt):
+        return "analysis"
+
+    with patch("repomix.utils.multi_directory.process_directory", new=fake_process_directory):
+        with patch("repomix.utils.multi_directory.query_model", new=fake_query_model):
+            result = await analyze_directories(
+                [str(tmp_path / name) for name in names],
+                model="openai/gpt-4o-mini",
+                question="?",
+                max_concurrent=max_concurrent
+            )
+
+    assert peak == min(max_concurrent, len(names))
+    assert len(result["directory_results"]) == len(names)
+
+@pytest.mark.asyncio
+async def test_analyze_directories_cancels_pending_requests_on_failure(tmp_path):
+    """Test one failed request cancels the requests still in flight."""
+    build_tree(tmp_path, {"a/main.py": "a", "b/main.py": "b"})
+
+    cancelled = []
+    async def fake_query_model(model, content, system_prompt):
+        if "File: main.py\na" in content:
+            raise litellm.NotFoundError(message="Model not found", model=model, llm_provider="openai")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Unwinding takes a while, e.g. closing the connection
+            await asyncio.sleep(0.05)
+            cancelled.append(content)
+            raise
+
+    with patch("repomix.utils.multi_directory.query_model", new=fake_query_model):
+        with pytest.raises(litellm.NotFoundError):
+            await asyncio.wait_for(
+                analyze_directories([str(tmp_path / "a"), str(tmp_path / "b")], "openai/gpt-5", "?"),
+                timeout=5
+            )
+    assert len(cancelled) == 1
+
 @pytest.mark.asyncio
 async def test_error_handling():
     """Test error handling with real edge cases."""
     logger.info("Testing error handling")
 
-    # Test with empty directory list
-    with pytest.raises(ValueError):
-        await analyze_directories(
-            [],
-            model="openai/gpt-4o-mini",
-            question="test"
-        )
-
-    # Test with invalid directory
-    with pytest.raises(ValueError):
-        await validate_directories(["nonexistent/dir"])
+    # Empty directory list and invalid directory are independent, so check them together
+    empty_error, invalid_error = await asyncio.gather(
+        analyze_directories([], model="openai/gpt-4o-mini", question="test"),
+        validate_directories(["nonexistent/dir"]),
+        return_exceptions=True
+    )
+    assert isinstance(empty_error, ValueError)
+    assert isinstance(invalid_error, ValueError)
 
     # Test with invalid model ID (404 error according to litellm docs)
     with pytest.raises(litellm.NotFoundError):
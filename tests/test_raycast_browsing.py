@@ -5,14 +5,16 @@
 
 import pytest
 import asyncio
-import json
+import os
+import socket
+from functools import lru_cache
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Tuple
 from loguru import logger
 from repomix.utils.git import parse_github_url, clone_repository, cleanup_repository
-from repomix.utils.parser import glob_files, concatenate_files
+from repomix.utils.parser import glob_files, concatenate_files, concatenate_files_to
 from repomix.utils.llm import query_model, save_response, initialize_litellm_cache
-from repomix.utils.file_utils import load_env_file
+from repomix.utils.file_utils import load_env_file, load_json
 from repomix.utils.models import LLMResponse, TokenUsage, Message, LLMRequest
 from litellm import acompletion
 import litellm
@@ -20,7 +22,9 @@ import litellm
 
 TEST_REPO_URL = "https://github.com/raycast/script-commands/tree/master/commands/browsing"
 TEST_MODEL = "gpt-4o-mini"
-DEFAULT_IGNORE_PATTERNS = [
+# (repo_url, branch, target_dir), parsed once for the fixtures and tests below
+TEST_REPO = parse_github_url(TEST_REPO_URL)
+DEFAULT_IGNORE_PATTERNS = (
     "*.pyc",
     "__pycache__/*",
     ".git/*",
@@ -31,7 +35,35 @@ DEFAULT_IGNORE_PATTERNS = [
     "*.json",
     "*.yaml",
     "*.yml"
-]
+)
+# Tuples, so glob_files reuses the same compiled matcher on every call
+GLOBBING_IGNORE_PATTERNS = DEFAULT_IGNORE_PATTERNS + (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.ico",
+    "*.svg",
+    "images/*"
+)
+
+
+@lru_cache(maxsize=32)
+def _cached_glob(repo_dir: Path, target_dir: str, patterns: Tuple[str, ...]) -> Tuple[Path, ...]:
+    """Glob the shared checkout once per pattern set; it is not modified during the session."""
+    return tuple(glob_files(repo_dir, target_dir, patterns))
+
+
+@lru_cache(maxsize=None)
+def _redis_available() -> bool:
+    """Probe the configured Redis server once, without waiting out a connect timeout."""
+    host = os.environ.get("REDIS_HOST", "localhost")
+    port = int(os.environ.get("REDIS_PORT", "6379"))
+    try:
+        socket.create_connection((host, port), timeout=0.2).close()
+    except OSError:
+        return False
+    return True
 
 
 @pytest.fixture(autouse=True)
@@ -46,23 +78,29 @@ def output_dir(tmp_path):
     return tmp_path / "output"
 
 
-@pytest.fixture
-async def repo_setup():
-    """Set up repository and clean up after test."""
-    repo_url, branch, target_dir = parse_github_url(TEST_REPO_URL)
-    if not branch:
-        branch = "master"
-    repo_dir = clone_repository(repo_url, branch)
-    
-    try:
-        yield repo_dir, target_dir
-    finally:
-        cleanup_repository(repo_dir)
+@pytest.fixture(scope="session")
+def repo_setup(raycast_repo):
+    """Share one checkout of the repository, from the cached mirror, across the session."""
+    return raycast_repo, TEST_REPO[2]
+
+
+@pytest.fixture(scope="module")
+def mock_llm_response():
+    """Build the canned model response once; tests that change it should model_copy() first."""
+    return LLMResponse(
+        id="test-id",
+        response="Test response",
+        metadata={"model": "test-model"},
+        usage=TokenUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    )
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def initialize_cache():
-    """Initialize Redis cache for each test."""
+    """Initialize Redis cache once for the session."""
+    # Probed here rather than in skipif so REDIS_HOST/REDIS_PORT from .env apply
+    if not _redis_available():
+        pytest.skip("redis unavailable")
     initialize_litellm_cache()
     yield
     # Clean up cache after test if needed
@@ -72,15 +110,12 @@ def initialize_cache():
 @pytest.mark.asyncio
 async def test_litellm_basic():
     """Test basic async completion with mock response."""
-    try:
-        response = await acompletion(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "Hello world"}],
-            mock_response="Hello! How can I help you today?"
-        )
-        assert response.choices[0].message.content == "Hello! How can I help you today?"
-    except Exception as e:
-        pytest.fail(f"Error occurred: {e}")
+    response = await acompletion(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": "Hello world"}],
+        mock_response="Hello! How can I help you today?"
+    )
+    assert response.choices[0].message.content == "Hello! How can I help you today?"
 
 
 @pytest.mark.asyncio
@@ -105,27 +140,7 @@ async def test_repository_setup(repo_setup):
 async def test_file_globbing(repo_setup):
     """Test file globbing and filtering."""
     repo_dir, target_dir = repo_setup
-    ignore_patterns = [
-        "*.pyc",
-        "__pycache__/*",
-        ".git/*",
-        ".github/*",
-        "*.log",
-        "*.md",
-        "*.txt",
-        "*.json",
-        "*.yaml",
-        "*.yml",
-        "*.png",
-        "*.jpg",
-        "*.jpeg",
-        "*.gif",
-        "*.ico",
-        "*.svg",
-        "images/*"
-    ]
-    
-    files = glob_files(repo_dir, target_dir, ignore_patterns)
+    files = _cached_glob(repo_dir, target_dir, GLOBBING_IGNORE_PATTERNS)
     assert len(files) > 0, "No files found in repository"
     assert all(not f.match("*.png") for f in files), "Image files should be filtered"
 
@@ -136,14 +151,14 @@ async def test_file_concatenation(repo_setup, output_dir):
     repo_dir, target_dir = repo_setup
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    files = glob_files(repo_dir, target_dir, ["*.pyc"])  # Minimal ignore pattern for test
-    content = concatenate_files(files, repo_dir, TEST_REPO_URL, target_dir)
-    
+    files = _cached_glob(repo_dir, target_dir, ("*.pyc",))  # Minimal ignore pattern for test
     concat_path = output_dir / "concatenated.txt"
-    concat_path.write_text(content)
+    # Stream each file straight to disk rather than building the whole string first
+    with open(concat_path, "w", encoding="utf-8", buffering=1 << 17) as writer:
+        concatenate_files_to(writer, files, repo_dir, TEST_REPO_URL, target_dir)
     
     assert concat_path.exists(), "Concatenated file not created"
-    assert len(content) > 0, "Concatenated content is empty"
+    assert concat_path.stat().st_size > 0, "Concatenated content is empty"
 
 
 @pytest.mark.asyncio
@@ -153,33 +168,24 @@ async def test_model_query_mock():
     mock_system_prompt = "Test analysis"
     mock_response_text = "Mocked analysis result"
     
-    try:
-        response = await query_model(
-            TEST_MODEL,
-            mock_content,
-            mock_system_prompt
-        )
-        assert response is not None, "No response received"
-    except Exception as e:
-        pytest.fail(f"Error querying model: {e}")
+    response = await query_model(
+        TEST_MODEL,
+        mock_content,
+        mock_system_prompt
+    )
+    assert response is not None, "No response received"
 
 
 @pytest.mark.asyncio
-async def test_response_saving(output_dir):
+async def test_response_saving(output_dir, mock_llm_response):
     """Test saving model response."""
     output_dir.mkdir(parents=True, exist_ok=True)
-    mock_response = LLMResponse(
-        id="test-id",
-        response="Test response",
-        metadata={"model": "test-model"},
-        usage=TokenUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15)
-    )
     response_path = output_dir / "response.json"
     
-    save_response(mock_response, response_path)
+    save_response(mock_llm_response, response_path)
     
     assert response_path.exists(), "Response file not created"
-    saved_data = json.loads(response_path.read_text())
+    saved_data = load_json(response_path)
     assert "response" in saved_data, "No response in output"
     assert "metadata" in saved_data, "No metadata in output"
 
@@ -191,7 +197,7 @@ async def test_full_integration(repo_setup, output_dir):
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Find and process files
-    files = glob_files(repo_dir, target_dir, ["*.pyc"])
+    files = _cached_glob(repo_dir, target_dir, ("*.pyc",))
     content = concatenate_files(files, repo_dir, TEST_REPO_URL, target_dir)
     
     # Query model with mock
@@ -207,7 +213,7 @@ async def test_full_integration(repo_setup, output_dir):
     save_response(llm_response, response_path)
     
     assert response_path.exists(), "Response file not created"
-    response_data = json.loads(response_path.read_text())
+    response_data = load_json(response_path)
     assert "response" in response_data, "No response in output"
     assert "metadata" in response_data, "No metadata in output"
 
@@ -217,7 +223,7 @@ async def test_raycast_browsing_analysis():
     """Test analyzing Raycast browsing scripts directory."""
     try:
         # Parse repository URL
-        repo_url, branch, target_dir = parse_github_url(TEST_REPO_URL)
+        repo_url, branch, target_dir = TEST_REPO
         assert branch == "master"  # Ensure branch is not None
         
         # Clone repository
@@ -293,7 +299,7 @@ async def test_redis_cache_hit(initialize_cache):
 
     # First call should miss cache
     logger.info("Testing cache with completion call...")
-    response1 = litellm.completion(
+    response1 = await acompletion(
         model="gpt-4o-mini",
         messages=test_messages,
         cache={"no-cache": False}
@@ -302,11 +308,15 @@ async def test_redis_cache_hit(initialize_cache):
     if m := response1._hidden_params.get("cache_hit"):
         logger.info(f"Response 1: Cache hit: {m}")
 
-    # Wait for cache to be written
-    await asyncio.sleep(1)
+    # Wait for the cache write to land, up to the old one-second ceiling
+    cache_key = litellm.cache.get_cache_key(model="gpt-4o-mini", messages=test_messages)
+    for _ in range(50):
+        if await asyncio.get_running_loop().run_in_executor(None, litellm.cache.cache.get_cache, cache_key) is not None:
+            break
+        await asyncio.sleep(0.02)
 
     # Second call should hit cache
-    response2 = litellm.completion(
+    response2 = await acompletion(
         model="gpt-4o-mini",
         messages=test_messages,
         cache={"no-cache": False}